@@ -0,0 +1,61 @@
+import asyncio
+from intbase import InterpreterBase
+from interpreterv2 import Interpreter
+from tokenizer import Keyword
+
+class AsyncInterpreter(Interpreter):
+  '''
+  Interpreter that runs as a coroutine, so many Brewin programs can share one event loop.
+
+  Input is read by awaiting an async input provider (any coroutine function returning the next line
+  of input), and control is handed back to the event loop every `yield_every` statements so a
+  long-running program can't starve the other sessions. Programs are always interpreted; the
+  transpiler backend can't suspend in the middle of a program.
+  '''
+  def __init__(self, console_output=True, input=None, trace_output=False, input_provider=None, yield_every=1000):
+    super().__init__(console_output, input, trace_output)
+    self.input_provider = input_provider
+    self.yield_every = yield_every
+
+  async def run(self, program):
+    '''
+    Run a program, provided in an array of strings, one string per line of source code.
+    '''
+    self._load(program)
+
+    statements = 0
+    while not self.terminate:
+      if self._is_input_call(self.ip):
+        await self._input_async()
+      else:
+        self._process_line()
+      statements += 1
+      if statements >= self.yield_every:
+        statements = 0
+        await asyncio.sleep(0)
+
+  async def get_input_async(self):
+    '''
+    Gets the next line of input from the input provider, or from the input list if there's no provider.
+    With neither, the keyboard is read on a worker thread, so the other sessions keep running.
+    '''
+    if self.input_provider is not None:
+      return await self.input_provider()
+    if not self.input:
+      return await asyncio.get_running_loop().run_in_executor(None, super().get_input)
+    return super().get_input()
+
+  def _is_input_call(self, line_num):
+    return self.ops[line_num] == Keyword.FUNCCALL and self.tokenized_program.token(line_num, 1) == InterpreterBase.INPUT_DEF
+
+  async def _input_async(self):
+    '''
+    Async equivalent of running a `funccall input` line through _process_line.
+    '''
+    if self.trace_output:
+      print(f"{self.ip:04}: {self.program[self.ip].rstrip()}")
+    args = self.tokenized_program.args(self.ip)[1:]
+    if args:
+      self._print(args)
+    self._store_input(await self.get_input_async())
+    self._advance_to_next_statement()
@@ -0,0 +1,524 @@
+from intbase import InterpreterBase
+from value import Type
+from env_v1 import EnvironmentManager
+from interpreterv2 import Interpreter
+from tokenizer import Keyword
+import frontend
+
+try:
+  import numpy as np
+except ImportError:  # batch execution is optional
+  np = None
+
+# Lockstep batch execution: one program runs over many input vectors at once. Every variable holds a
+# column with one entry per lane (input vector), expressions are evaluated on whole columns, and
+# divergent if/while paths run each side under a mask of the lanes taking it.
+#
+# Anything a lane does that the columns can't mirror exactly (errors, ints that could outgrow an
+# int64, running out of input, loops that only a few lanes are still in, deep recursion) drops
+# that lane out of the batch; dropped lanes are re-run on their own by the regular interpreter.
+
+INT_LIMIT = 2 ** 62  # columns only hold ints whose arithmetic can't overflow an int64
+RESULT_TYPES = {'resulti': Type.INT, 'resultb': Type.BOOL, 'results': Type.STRING}
+RESULT_NAMES = {t: name for name, t in RESULT_TYPES.items()}
+VAR_TYPES = {
+  InterpreterBase.INT_DEF: Type.INT,
+  InterpreterBase.BOOL_DEF: Type.BOOL,
+  InterpreterBase.STRING_DEF: Type.STRING,
+}
+DEFAULTS = {Type.INT: 0, Type.BOOL: False, Type.STRING: ''}
+CLOSERS = (Keyword.ELSE, Keyword.ENDIF, Keyword.ENDWHILE, Keyword.ENDFUNC)
+
+
+class LaneResult:
+  '''
+  The outcome of running the program on one input vector: its output lines, the error type, line
+  and exception it stopped with (all None if it ran to completion), and whether it had to be
+  re-run by the scalar interpreter.
+  '''
+  def __init__(self, output, error_type=None, error_line=None, exception=None, scalar=False):
+    self.output = output
+    self.error_type = error_type
+    self.error_line = error_line
+    self.exception = exception
+    self.scalar = scalar
+
+
+class Column:
+  '''
+  A variable's values across all lanes: a type and a NumPy array with one entry per lane.
+  '''
+  __slots__ = ('t', 'v')
+
+  def __init__(self, type, values):
+    self.t = type
+    self.v = values
+
+
+class _Frame:
+  '''A function call in progress: the lanes that haven't returned yet, its return type and call depth.'''
+  __slots__ = ('active', 'return_type', 'depth')
+
+  def __init__(self, active, return_type, depth):
+    self.active = active
+    self.return_type = return_type
+    self.depth = depth
+
+
+class _Fallback(Exception):
+  '''Raised when a statement can't be run in lockstep for the given lanes.'''
+  def __init__(self, lanes):
+    self.lanes = lanes
+
+
+class BatchInterpreter:
+  '''
+  Runs one program over many input vectors in lockstep.
+
+  `divergence` and `min_iterations` decide when a while loop has diverged too much: once it has
+  run min_iterations times, if fewer than `divergence` of the lanes that entered it are still
+  looping, those lanes finish on the scalar interpreter instead. Calls nested deeper than
+  `max_depth` are also left to the scalar interpreter.
+  '''
+  def __init__(self, divergence=0.1, min_iterations=32, max_depth=200):
+    if np is None:
+      raise ImportError('batch execution requires numpy')
+    self.divergence = divergence
+    self.min_iterations = min_iterations
+    self.max_depth = max_depth
+    self._setup_operations()
+
+  def run(self, program, inputs):
+    '''
+    Runs a program, provided as an array of strings, once for every list of input lines in inputs.
+    Returns a LaneResult per input vector, in order.
+    '''
+    self.lines = program
+    self.inputs = [list(lane) if lane is not None else None for lane in inputs]
+    self.lanes = len(self.inputs)
+    self.alive = np.ones(self.lanes, dtype=bool)     # lanes still running in the batch
+    self.scalar = np.zeros(self.lanes, dtype=bool)   # lanes dropped out for the scalar interpreter
+    self.outputs = [[] for _ in range(self.lanes)]
+    self.cursors = [0] * self.lanes
+    try:
+      self.program = frontend.compile_program(program, reachable_only=True)
+    except Exception:
+      self.program = None
+      self.scalar[:] = True
+    else:
+      self._run_batch()
+    return [self._run_scalar(lane) if self.scalar[lane] else LaneResult(self.outputs[lane]) for lane in range(self.lanes)]
+
+  def _run_batch(self):
+    program = self.program
+    self.tokenized_program = program.tokenized_program
+    self.ops = program.tokenized_program.ops
+    self.jumps = program.jumps
+    self.opens_scope = program.opens_scope
+    self.func_manager = program.func_manager
+    self.line_args = {}
+    self.call_sites = {}
+    self.literals = {}    # literal token -> Column holding it in every lane
+    self.results = {}     # result register name -> Column
+    self.results_set = {} # result register name -> lanes where it has been set
+    self.env_manager = EnvironmentManager()
+
+    everyone = np.ones(self.lanes, dtype=bool)
+    main = self.func_manager.get_function_info(InterpreterBase.MAIN_FUNC)
+    if main is None or main.params:
+      self._fallback(everyone)
+      return
+    try:
+      self._run_function(main, everyone, 0)
+    except Exception:
+      self._fallback(self.alive.copy())
+
+  def _run_scalar(self, lane):
+    '''Runs the program for a single lane with the regular interpreter.'''
+    interpreter = Interpreter(console_output=False, input=self.inputs[lane])
+    interpreter.compiled = self.program  # share the front end's work
+    exception = None
+    try:
+      interpreter.run(self.lines)
+    except Exception as e:
+      exception = e
+    error_type, error_line = interpreter.get_error_type_and_line()
+    return LaneResult(interpreter.get_output(), error_type, error_line, exception, scalar=True)
+
+  def _fallback(self, lanes):
+    '''Drops lanes out of the batch so they get re-run by the scalar interpreter.'''
+    if lanes.any():
+      self.alive &= ~lanes
+      self.scalar |= lanes
+
+  def _run_function(self, func_info, mask, depth):
+    frame = _Frame(mask.copy(), func_info.return_type, depth)
+    end = self._run_body(func_info.start_ip, mask, frame)
+    if end is None:
+      return
+    remaining = mask & frame.active & self.alive
+    if self.ops[end] != Keyword.ENDFUNC:
+      self._fallback(remaining)
+    elif frame.return_type in RESULT_NAMES:
+      self._set_result(RESULT_NAMES[frame.return_type], self._literal_default(frame.return_type), remaining)
+
+  def _run_body(self, line_num, mask, frame):
+    '''
+    Runs the statements of a block for the lanes in mask, starting at line_num. Returns the line
+    of the else/endif/endwhile/endfunc that ended the block, or None once no lane is left running it.
+    '''
+    ops = self.ops
+    while True:
+      if line_num >= len(ops):
+        self._fallback(mask & frame.active & self.alive)
+        return None
+      op = ops[line_num]
+      if op == Keyword.NONE:
+        line_num += 1
+        continue
+      if op in CLOSERS:
+        return line_num
+      m = mask & frame.active & self.alive
+      if not m.any():
+        return None
+
+      args = self.line_args.get(line_num)
+      if args is None:
+        args = self.line_args[line_num] = self.tokenized_program.args(line_num)
+      try:
+        match op:
+          case Keyword.VAR:
+            self._var(args, m)
+          case Keyword.ASSIGN:
+            self._assign(args, m)
+          case Keyword.FUNCCALL:
+            self._funccall(line_num, args, m, frame)
+          case Keyword.IF:
+            line_num = self._if(line_num, args, m, frame)
+            continue
+          case Keyword.WHILE:
+            line_num = self._while(line_num, args, m, frame)
+            continue
+          case Keyword.RETURN:
+            self._return(args, m, frame)
+          case default:
+            raise _Fallback(m)
+      except _Fallback as e:
+        self._fallback(e.lanes)
+      except Exception:
+        self._fallback(m)
+      line_num += 1
+
+  def _var(self, tokens, m):
+    if len(tokens) < 2 or tokens[0] not in VAR_TYPES:
+      raise _Fallback(m)
+    var_type = VAR_TYPES[tokens[0]]
+    for var_name in tokens[1:]:
+      if self.env_manager.exists_scope(var_name) or var_name in RESULT_TYPES:
+        raise _Fallback(m)  # a variable hiding a result register is left to the interpreter
+      self.env_manager.add(var_name, self._column(var_type, DEFAULTS[var_type]))
+
+  def _assign(self, tokens, m):
+    var_name = tokens[0]
+    value = self._eval_expression(tokens[1:], m)
+    if var_name in self.results:
+      # lanes that haven't set the register yet assign to a variable of that name instead
+      self._fallback(m & ~self.results_set[var_name])
+      if RESULT_TYPES[var_name] != value.t:
+        raise _Fallback(m)
+      self._set_result(var_name, value, m & self.alive)
+      return
+    target = self.env_manager.get(var_name)
+    if target is None or target.t != value.t:
+      raise _Fallback(m)
+    m = m & self.alive
+    target.v[m] = value.v[m]
+
+  def _funccall(self, line_num, args, m, frame):
+    if not args:
+      raise _Fallback(m)
+    if args[0] == InterpreterBase.PRINT_DEF:
+      self._print(args[1:], m)
+    elif args[0] == InterpreterBase.INPUT_DEF:
+      self._input(args[1:], m)
+    elif args[0] == InterpreterBase.STRTOINT_DEF:
+      self._strtoint(args[1:], m)
+    else:
+      self._call(line_num, args[0], args[1:], m, frame)
+
+  def _call(self, line_num, funcname, args, m, frame):
+    func_info = self.call_sites.get(line_num)
+    if func_info is None:
+      func_info = self.func_manager.get_function_info(funcname)
+      if func_info is None or len(func_info.names) != len(args) or not RESULT_TYPES.keys().isdisjoint(func_info.names):
+        raise _Fallback(m)
+      self.call_sites[line_num] = func_info
+    if frame.depth >= self.max_depth:
+      raise _Fallback(m)
+
+    values = []
+    for var_name, (param_name, param_type, ref) in zip(args, func_info.params):
+      var = self._get_value(var_name, m)
+      if var.t != param_type:
+        raise _Fallback(m)
+      if not ref or var_name in self.literals:
+        var = Column(var.t, var.v.copy())
+      values.append(var)
+
+    self.env_manager.push_frame()
+    try:
+      scope = self.env_manager.environment[-1]
+      for (param_name, _, _), value in zip(func_info.params, values):
+        scope[param_name] = value
+      self._run_function(func_info, m & self.alive, frame.depth + 1)
+    finally:
+      self.env_manager.pop_frame()
+
+  def _if(self, line_num, args, m, frame):
+    if not args or not self.jumps[line_num]:
+      raise _Fallback(m)
+    condition = self._condition(args, m)
+    end = line_num + self.jumps[line_num]
+    self._branch(line_num, m & condition, frame, end)
+    if self.ops[end] != Keyword.ELSE:
+      return end + 1
+    endif = end + self.jumps[end]
+    self._branch(end, m & ~condition & self.alive, frame, endif)
+    return endif + 1
+
+  def _branch(self, line_num, mask, frame, end):
+    '''Runs one side of an if for the lanes in mask.'''
+    if not mask.any():
+      return
+    if self.opens_scope[line_num]:
+      self.env_manager.push_scope()
+    try:
+      stop = self._run_body(line_num + 1, mask, frame)
+    finally:
+      if self.opens_scope[line_num]:
+        self.env_manager.pop_scope()
+    if stop is not None and stop != end:
+      self._fallback(mask & frame.active & self.alive)
+
+  def _while(self, line_num, args, m, frame):
+    if not args or not self.jumps[line_num]:
+      raise _Fallback(m)
+    end = line_num + self.jumps[line_num]
+    entered = m.sum()
+    active = m
+    iterations = 0
+    while True:
+      active = active & frame.active & self.alive
+      if not active.any():
+        break
+      try:
+        active = active & self._condition(args, active)
+      except _Fallback as e:
+        self._fallback(e.lanes)
+        break
+      if not active.any():
+        break
+      if iterations >= self.min_iterations and active.sum() < self.divergence * entered:
+        self._fallback(active)  # too few lanes left looping to be worth running in lockstep
+        break
+      if self.opens_scope[line_num]:
+        self.env_manager.push_scope()
+      try:
+        stop = self._run_body(line_num + 1, active, frame)
+      finally:
+        if self.opens_scope[line_num]:
+          self.env_manager.pop_scope()
+      if stop is not None and stop != end:
+        self._fallback(active & frame.active & self.alive)
+        break
+      iterations += 1
+    return end + 1
+
+  def _condition(self, args, m):
+    value = self._eval_expression(args, m)
+    if value.t != Type.BOOL:
+      raise _Fallback(m)
+    return value.v
+
+  def _return(self, args, m, frame):
+    if args:
+      value = self._eval_expression(args, m)
+      if value.t != frame.return_type:
+        raise _Fallback(m)
+      m = m & self.alive
+      self._set_result(RESULT_NAMES[value.t], value, m)
+    elif frame.return_type in RESULT_NAMES:
+      self._set_result(RESULT_NAMES[frame.return_type], self._literal_default(frame.return_type), m)
+    frame.active &= ~m
+
+  def _print(self, args, m):
+    if not args:
+      raise _Fallback(m)
+    values = [self._get_value(arg, m) for arg in args]
+    lanes = np.flatnonzero(m & self.alive)
+    columns = [value.v[lanes].tolist() for value in values]
+    outputs = self.outputs
+    for i, lane in enumerate(lanes.tolist()):
+      outputs[lane].append(''.join([str(column[i]) for column in columns]))
+
+  def _input(self, args, m):
+    if args:
+      self._print(args, m)
+    m = m & self.alive
+    values = np.full(self.lanes, '', dtype=object)
+    missing = np.zeros(self.lanes, dtype=bool)
+    for lane in np.flatnonzero(m).tolist():
+      lane_input = self.inputs[lane]
+      cursor = self.cursors[lane]
+      if not lane_input or cursor >= len(lane_input):
+        missing[lane] = True  # reads the keyboard or gets None: left to the scalar interpreter
+        continue
+      values[lane] = lane_input[cursor]
+      self.cursors[lane] = cursor + 1
+    self._fallback(missing)
+    self._set_result('results', Column(Type.STRING, values), m & ~missing)
+
+  def _strtoint(self, args, m):
+    if len(args) != 1:
+      raise _Fallback(m)
+    value = self._get_value(args[0], m)
+    if value.t != Type.STRING:
+      raise _Fallback(m)
+    m = m & self.alive
+    values = np.zeros(self.lanes, dtype=np.int64)
+    bad = np.zeros(self.lanes, dtype=bool)
+    lanes = np.flatnonzero(m)
+    for lane, text in zip(lanes.tolist(), value.v[lanes].tolist()):
+      try:
+        number = int(text)
+      except Exception:
+        number = None
+      if number is None or abs(number) >= INT_LIMIT:
+        bad[lane] = True
+      else:
+        values[lane] = number
+    self._fallback(bad)
+    self._set_result('resulti', Column(Type.INT, values), m & ~bad)
+
+  def _set_result(self, name, value, lanes):
+    register = self.results.get(name)
+    if register is None:
+      register = self.results[name] = self._column(RESULT_TYPES[name], DEFAULTS[RESULT_TYPES[name]])
+      self.results_set[name] = np.zeros(self.lanes, dtype=bool)
+    # setting a register rebinds it, so a ref parameter bound to it keeps the old values
+    values = register.v.copy()
+    values[lanes] = value.v[lanes]
+    self.results[name] = Column(register.t, values)
+    self.results_set[name] |= lanes
+
+  def _column(self, var_type, value):
+    dtype = {Type.INT: np.int64, Type.BOOL: bool, Type.STRING: object}[var_type]
+    return Column(var_type, np.full(self.lanes, value, dtype=dtype))
+
+  def _literal_default(self, var_type):
+    return self._literal({Type.INT: '0', Type.BOOL: InterpreterBase.FALSE_DEF, Type.STRING: '""'}[var_type])
+
+  def _literal(self, token):
+    column = self.literals.get(token)
+    if column is None:
+      if token[0] == '"':
+        column = self._column(Type.STRING, token.strip('"'))
+      elif token == InterpreterBase.TRUE_DEF or token == InterpreterBase.FALSE_DEF:
+        column = self._column(Type.BOOL, token == InterpreterBase.TRUE_DEF)
+      else:
+        number = int(token)
+        if abs(number) >= INT_LIMIT:
+          return None
+        column = self._column(Type.INT, number)
+      self.literals[token] = column
+    return column
+
+  def _get_value(self, token, m):
+    if not token:
+      raise _Fallback(m)
+    if token[0] == '"' or token.isdigit() or token[0] == '-' or token == InterpreterBase.TRUE_DEF or token == InterpreterBase.FALSE_DEF:
+      value = self._literal(token)
+      if value is None:
+        raise _Fallback(m)
+      return value
+    value = self.results.get(token)
+    if value is not None:
+      # lanes that haven't set the register yet read a variable of that name instead
+      self._fallback(m & ~self.results_set[token])
+      return value
+    value = self.env_manager.get(token)
+    if value is None:
+      raise _Fallback(m)
+    return value
+
+  def _setup_operations(self):
+    '''
+    Creates a lookup table of the ufuncs that run each operator on columns of each type,
+    along with the type of their result.
+    '''
+    self.binary_op_list = ['+','-','*','/','%','==','!=', '<', '<=', '>', '>=', '&', '|']
+    comparisons = {
+      '==': (np.equal, Type.BOOL),
+      '!=': (np.not_equal, Type.BOOL),
+      '>': (np.greater, Type.BOOL),
+      '<': (np.less, Type.BOOL),
+      '>=': (np.greater_equal, Type.BOOL),
+      '<=': (np.less_equal, Type.BOOL),
+    }
+    self.binary_ops = {}
+    self.binary_ops[Type.INT] = {
+      '+': (np.add, Type.INT),
+      '-': (np.subtract, Type.INT),
+      '*': (np.multiply, Type.INT),
+      '/': (np.floor_divide, Type.INT),  # rounds like Python's //
+      '%': (np.remainder, Type.INT),
+      **comparisons,
+    }
+    self.binary_ops[Type.STRING] = {
+      '+': (np.add, Type.STRING),
+      **comparisons,
+    }
+    self.binary_ops[Type.BOOL] = {
+      '&': (np.logical_and, Type.BOOL),
+      '|': (np.logical_or, Type.BOOL),
+      '==': (np.equal, Type.BOOL),
+      '!=': (np.not_equal, Type.BOOL),
+    }
+
+  def _eval_expression(self, tokens, m):
+    '''
+    Evaluates a prefix expression for every lane at once. Lanes outside m are computed too, but
+    only the lanes in m are checked for overflow and division by zero.
+    '''
+    stack = []
+    for token in reversed(tokens):
+      if token in self.binary_op_list:
+        v1 = stack.pop()
+        v2 = stack.pop()
+        if v1.t != v2.t or token not in self.binary_ops[v1.t]:
+          raise _Fallback(m)
+        stack.append(self._binary(token, v1, v2, m))
+      elif token == '!':
+        v1 = stack.pop()
+        if v1.t != Type.BOOL:
+          raise _Fallback(m)
+        stack.append(Column(Type.BOOL, np.logical_not(v1.v)))
+      else:
+        stack.append(self._get_value(token, m))
+    if len(stack) != 1:
+      raise _Fallback(m)
+    return stack[0]
+
+  def _binary(self, token, v1, v2, m):
+    operation, result_type = self.binary_ops[v1.t][token]
+    a, b = v1.v, v2.v
+    if v1.t == Type.INT:
+      if token == '+' or token == '-' or token == '*':
+        estimate = operation(a.astype(np.float64), b.astype(np.float64))
+        self._fallback(m & (np.abs(estimate) >= INT_LIMIT))
+      elif token == '/' or token == '%':
+        zero = b == 0
+        if zero.any():
+          self._fallback(m & zero)
+          b = np.where(zero, 1, b)
+    return Column(result_type, operation(a, b))
@@ -0,0 +1,22 @@
+import os
+import sys
+from interpreterv2 import Interpreter
+
+# Minimal command line entry point for short runs, where startup is most of the time:
+#
+#   python brewin.py program.src
+#
+# Runs the program like test.py does, but imports nothing beyond the interpreter and, once the
+# program finishes, exits without tearing the interpreter down (output is flushed first).
+# Errors are raised as usual.
+
+def main():
+  with open(sys.argv[1], 'r') as file:
+    lines = file.readlines()
+  Interpreter().run(lines)
+  sys.stdout.flush()
+  sys.stderr.flush()
+  os._exit(0)
+
+if __name__ == '__main__':
+  main()
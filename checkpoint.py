@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import zlib
+from value import Type, Value
+from env_v1 import RESULT_NAMES
+
+# Checkpoint and resume for long-running programs. A snapshot holds everything an Interpreter
+# needs to carry on from the statement it stopped at: the instruction pointer and return
+# addresses, every scope and result register, the input cursor and the output printed so far.
+#
+# Values are stored once in a table and scopes refer to them by index, so a variable passed by
+# reference is still shared between the caller's and the callee's scopes after a resume. The
+# snapshot is zlib-compressed JSON, tagged with a hash of the program so it can't be resumed
+# against a different one.
+
+VERSION = 1
+
+
+class CheckpointError(Exception):
+  '''Raised when a snapshot can't be resumed.'''
+
+
+def program_hash(program):
+  return hashlib.sha256(json.dumps(program).encode()).hexdigest()
+
+
+def snapshot(interpreter, statements=0):
+  '''
+  Returns a snapshot of a running interpreter, taken between two statements, as bytes.
+  '''
+  env = interpreter.env_manager
+  values = []
+  indexes = {}  # id of a Value -> its index in values
+
+  def index(value):
+    i = indexes.get(id(value))
+    if i is None:
+      i = indexes[id(value)] = len(values)
+      values.append([value.t.value, value.value(), value.ref])
+    return i
+
+  def scopes(environment):
+    return [[[name, index(value)] for name, value in scope.items()] for scope in environment]
+
+  state = {
+    'version': VERSION,
+    'program': program_hash(interpreter.program),
+    'statements': statements,
+    'ip': interpreter.ip,
+    'return_stack': interpreter.return_stack,
+    'terminate': interpreter.terminate,
+    'environment': scopes(env.environment),
+    'prev_environments': [scopes(environment) for environment in env.prev_environments],
+    'frames': env.frames,
+    'return_types': [t.value if t is not None else None for t in env.return_stack],
+    'results': {name: index(value) for name, value in env.results.items()},
+    'input_cursor': interpreter.input_cursor,
+    'output': interpreter.output_log,
+  }
+  state['values'] = values
+  return zlib.compress(json.dumps(state, separators=(',', ':')).encode())
+
+
+def restore(interpreter, program, data):
+  '''
+  Loads a program into an interpreter and puts it in the state saved in a snapshot. Returns the
+  number of statements that had run when the snapshot was taken.
+  '''
+  try:
+    state = json.loads(zlib.decompress(data))
+  except (zlib.error, ValueError) as e:
+    raise CheckpointError(f'Corrupt snapshot: {e}')
+  if state.get('version') != VERSION:
+    raise CheckpointError(f'Unsupported snapshot version {state.get("version")}')
+  if state['program'] != program_hash(program):
+    raise CheckpointError('The snapshot was taken from a different program')
+
+  interpreter.reset()
+  interpreter._load(program)
+  values = [Value(Type(t), v, ref) for t, v, ref in state['values']]
+
+  def scopes(saved):
+    return [{name: values[i] for name, i in scope} for scope in saved]
+
+  env = interpreter.env_manager
+  env.environment = scopes(state['environment'])
+  env.prev_environments = [scopes(environment) for environment in state['prev_environments']]
+  env.frames = state['frames']
+  env.return_stack = [Type(t) if t is not None else None for t in state['return_types']]
+  env.results = {name: values[i] for name, i in state['results'].items()}
+  env.results_shadowed = any(not RESULT_NAMES.isdisjoint(scope)
+                             for environment in [env.environment] + env.prev_environments for scope in environment)
+  interpreter.ip = state['ip']
+  interpreter.return_stack = state['return_stack']
+  interpreter.terminate = state['terminate']
+  interpreter.input_cursor = state['input_cursor']
+  interpreter.output_log = state['output']
+  return state['statements']
+
+
+def run(interpreter, program, path, every=100000):
+  '''
+  Runs a program on an interpreter, saving a snapshot to path every `every` statements. If path
+  already holds a snapshot of the same program, the run resumes from it instead of starting over,
+  so rerunning a job that died picks up where its last snapshot left off. The snapshot is removed
+  once the program finishes or stops with a Brewin error, and kept if anything else stops it.
+
+  Output already printed before the snapshot isn't printed again on resume, but it is in the
+  interpreter's output log.
+  '''
+  statements = 0
+  if os.path.exists(path):
+    with open(path, 'rb') as file:
+      statements = restore(interpreter, program, file.read())
+  else:
+    interpreter._load(program)
+
+  next_checkpoint = statements + every
+  try:
+    while not interpreter.terminate:
+      interpreter._process_line()
+      statements += 1
+      if statements >= next_checkpoint and not interpreter.terminate:
+        _save(path, snapshot(interpreter, statements))
+        next_checkpoint = statements + every
+  except Exception:
+    if interpreter.error_type is not None:
+      _remove(path)  # the program's own error: resuming would only run into it again
+    raise
+  _remove(path)
+
+
+def _remove(path):
+  if os.path.exists(path):
+    os.remove(path)
+
+
+def _save(path, data):
+  # write then rename, so a crash mid-write leaves the previous snapshot intact
+  temp_path = path + '.tmp'
+  with open(temp_path, 'wb') as file:
+    file.write(data)
+  os.replace(temp_path, path)
@@ -0,0 +1,45 @@
+import argparse
+import socket
+import sys
+from protocol import DEFAULT_SOCKET, send_message, receive_message
+
+# Thin command line client for daemon.py: sends a program and its input to the daemon and prints
+# what the program printed, like test.py does when running the program itself.
+#
+#   python client.py program.src [input ...] [--socket PATH] [--max-steps N] [--max-output N]
+
+def run(path, lines, input=None, max_steps=None, max_output=None):
+  '''Runs a program on the daemon listening at path and returns its response.'''
+  request = {'source': lines, 'input': input}
+  if max_steps is not None:
+    request['max_steps'] = max_steps
+  if max_output is not None:
+    request['max_output'] = max_output
+  with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+    sock.connect(path)
+    send_message(sock, request)
+    return receive_message(sock)
+
+def main():
+  parser = argparse.ArgumentParser(description='Run a Brewin program on the daemon')
+  parser.add_argument('program')
+  parser.add_argument('input', nargs='*', help='lines of input for the program')
+  parser.add_argument('--socket', default=DEFAULT_SOCKET)
+  parser.add_argument('--max-steps', type=int)
+  parser.add_argument('--max-output', type=int)
+  args = parser.parse_args()
+
+  with open(args.program, 'r') as file:
+    lines = file.readlines()
+  response = run(args.socket, lines, args.input, args.max_steps, args.max_output)
+  if response is None:
+    sys.exit('The daemon closed the connection')
+  if 'error' in response:
+    sys.exit(response['error'])
+  for line in response['output']:
+    print(line)
+  if response['exception']:
+    sys.exit(response['exception'])
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+import socket
+import socketserver
+import stat
+import sys
+import threading
+from interpreterv2 import Interpreter
+import frontend
+from protocol import DEFAULT_SOCKET, send_message, receive_message
+
+# A long-lived server that runs Brewin programs for clients connecting over a Unix domain socket,
+# so each run skips Python startup, imports and (for programs it has seen before) the front end.
+#
+# Messages are framed as described in protocol.py. A request is an object with
+#   source:     the program, as a list of lines (or)
+#   program:    the id of a program sent earlier
+#   input:      list of input lines (optional)
+#   max_steps:  stop the program after running this many statements (optional)
+#   max_output: stop the program once it has printed this many lines (optional)
+# and the response has the program's id, its output, and the error_type/error_line/exception it
+# stopped with (all null when it ran to completion). Requests that can't be run get an `error` instead.
+# A connection can send any number of requests, one after another.
+
+CACHE_SIZE = 256  # compiled programs kept
+
+
+class LimitExceeded(Exception):
+  '''Raised when a program runs past one of its request's limits.'''
+
+
+class LimitedInterpreter(Interpreter):
+  '''
+  Interpreter for the daemon's runs: it doesn't print, runs precompiled programs and enforces
+  the request's limits. One is kept per worker thread and reused for every request it serves.
+  '''
+  def __init__(self):
+    super().__init__(console_output=False)
+    self.max_output = None
+
+  def execute(self, compiled, input, max_steps=None, max_output=None):
+    self.input = input
+    self.reset()
+    self.max_output = max_output
+    self.compiled = compiled
+    if max_steps is None:
+      self.run(compiled.lines)
+      return
+
+    self._load(compiled.lines)
+    steps = 0
+    while not self.terminate:
+      self._process_line()
+      steps += 1
+      if steps >= max_steps and not self.terminate:
+        raise LimitExceeded(f'Program exceeded {max_steps} steps')
+
+  def get_input(self):
+    if not self.input:
+      return None  # there's no keyboard to read from
+    return super().get_input()
+
+  def _print(self, args):
+    if self.max_output is not None and len(self.output_log) >= self.max_output:
+      raise LimitExceeded(f'Program exceeded {self.max_output} lines of output')
+    super()._print(args)
+
+
+class ProgramCache:
+  '''
+  Compiled programs, by id (a hash of their source), evicting the least recently used.
+  '''
+  def __init__(self, size=CACHE_SIZE):
+    self.size = size
+    self.programs = {}
+    self.lock = threading.Lock()
+
+  def add(self, lines):
+    program_id = hashlib.sha256(json.dumps(lines).encode()).hexdigest()[:32]
+    with self.lock:
+      compiled = self.programs.pop(program_id, None)
+    if compiled is None:
+      compiled = frontend.compile_program(lines, reachable_only=True)
+    with self.lock:
+      self.programs[program_id] = compiled
+      while len(self.programs) > self.size:
+        del self.programs[next(iter(self.programs))]
+    return program_id, compiled
+
+  def get(self, program_id):
+    with self.lock:
+      compiled = self.programs.pop(program_id, None)
+      if compiled is not None:
+        self.programs[program_id] = compiled
+    return compiled
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+  def handle(self):
+    while True:
+      try:
+        request = receive_message(self.connection)
+      except (ValueError, ConnectionError):
+        return
+      if request is None:
+        return
+      send_message(self.connection, self.server.serve(request))
+
+
+class Daemon(socketserver.ThreadingUnixStreamServer):
+  '''
+  Serves run requests, one thread per connection.
+  '''
+  daemon_threads = True
+
+  def __init__(self, path=DEFAULT_SOCKET):
+    _remove_stale_socket(path)
+    super().__init__(path, RequestHandler)
+    self.path = path
+    self.cache = ProgramCache()
+    self.interpreters = threading.local()
+
+  def serve(self, request):
+    '''Runs a request and returns the response.'''
+    if not isinstance(request, dict):
+      return {'error': 'Request must be an object'}
+    if 'source' in request:
+      lines = request['source']
+      if not isinstance(lines, list) or not all(isinstance(line, str) for line in lines):
+        return {'error': 'source must be a list of lines'}
+      try:
+        program_id, compiled = self.cache.add(lines)
+      except Exception as e:
+        return self._response(None, [], None, None, e)  # the front end failed, as Interpreter.run would
+    else:
+      program_id = request.get('program')
+      compiled = self.cache.get(program_id)
+      if compiled is None:
+        return {'error': f'Unknown program {program_id}'}
+
+    interpreter = getattr(self.interpreters, 'interpreter', None)
+    if interpreter is None:
+      interpreter = self.interpreters.interpreter = LimitedInterpreter()
+    exception = None
+    try:
+      interpreter.execute(compiled, request.get('input'), request.get('max_steps'), request.get('max_output'))
+    except Exception as e:
+      exception = e
+    return self._response(program_id, interpreter.get_output(), *interpreter.get_error_type_and_line(), exception)
+
+  def _response(self, program_id, output, error_type, error_line, exception):
+    return {
+      'program': program_id,
+      'output': output,
+      'error_type': error_type.name if error_type is not None else None,
+      'error_line': error_line,
+      'exception': f'{type(exception).__name__}: {exception}' if exception is not None else None,
+    }
+
+  def server_close(self):
+    super().server_close()
+    path = getattr(self, 'path', None)  # not set if binding the socket failed
+    if path is not None and os.path.exists(path):
+      os.unlink(path)
+
+
+def _remove_stale_socket(path):
+  '''
+  Removes a socket left behind by a daemon that's no longer running. Anything else at the path,
+  including the socket of a daemon that's still running, is left alone and raises FileExistsError.
+  '''
+  try:
+    mode = os.stat(path).st_mode
+  except FileNotFoundError:
+    return
+  if not stat.S_ISSOCK(mode):
+    raise FileExistsError(f'{path} exists and is not a socket')
+  with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+    try:
+      probe.connect(path)
+    except ConnectionRefusedError:
+      os.unlink(path)  # left behind by a previous daemon
+      return
+  raise FileExistsError(f'A daemon is already listening on {path}')
+
+
+def main():
+  path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_SOCKET
+  with Daemon(path) as daemon:
+    try:
+      daemon.serve_forever()
+    except KeyboardInterrupt:
+      pass
+
+if __name__ == '__main__':
+  main()
@@ -1,3 +1,7 @@
+from value import Value
+
+RESULT_NAMES = frozenset(('resulti', 'resultb', 'results'))
+
 class EnvironmentManager:
     '''
     The EnvironmentManager class keeps a mapping between each global variable (aka symbol)
@@ -16,12 +20,21 @@ class EnvironmentManager:
         '''
         dwandwadawd
 
-        self.environment starts with two scopes because the 0th scope is for global variables like resulti, whereas
+        self.environment starts with two scopes because the 0th scope is for global variables, whereas
         the 1st scope is where the first declared variables will be stored.
+
+        The return values (resulti, resultb, results) aren't kept in any scope: they live in
+        self.results, a fixed set of registers that can be read in O(1) no matter how deeply
+        nested the scope reading them is. A variable or parameter with a register's name still
+        hides the register, as a global would be hidden; results_shadowed is set once one has
+        been declared, and only then do register reads need a scope walk first.
         '''
         self.environment = [{}, {}]
         self.prev_environments = []
         self.return_stack = []
+        self.results = {}  # result register name -> Value, once the register has been set
+        self.frames = [1]  # index of the first scope of every active function call (main's is scope 1)
+        self.results_shadowed = False
 
     def exists(self, symbol):
         '''Returns true if the variable exists.'''
@@ -44,9 +57,24 @@ class EnvironmentManager:
                 return scope[symbol]
         return None
 
+    def lookup(self, symbol):
+        '''
+        Gets the variable with a name or, if there's none, the result register with that name.
+        '''
+        if not self.results_shadowed:
+            value = self.results.get(symbol)
+            if value is not None:
+                return value
+        value = self.get(symbol)
+        if value is None:
+            value = self.results.get(symbol)
+        return value
+
     def add(self, symbol, value):
         '''Adds new variable the current scope.'''
         self.environment[-1][symbol] = value
+        if symbol in RESULT_NAMES:
+            self.results_shadowed = True
 
     def set(self, symbol, value):
         '''Sets the data associated with a variable name.'''
@@ -63,10 +91,10 @@ class EnvironmentManager:
 
     def set_return(self, symbol, value):
         '''
-        Sets the global return value (based by type eventually). To make it
-        global, this will be in the top-level scope.
+        Sets a result register. The register gets its own binding so it
+        doesn't alias the variable that was returned.
         '''
-        self.environment[0][symbol] = value
+        self.results[symbol] = Value(value.t, value.v)
 
     def clear_environment(self):
         '''Clears the current environment (except 0th scope)'''
@@ -87,6 +115,18 @@ class EnvironmentManager:
             environment = self.prev_environments.pop()
             self.environment += environment
 
+    def push_frame(self):
+        '''Creates the scope for a function call.'''
+        self.frames.append(len(self.environment))
+        self.environment.append(dict())
+
+    def pop_frame(self):
+        '''
+        Deletes the scope of the most recent function call, along with any
+        block scopes still open within it (e.g. when returning from inside a loop).
+        '''
+        del self.environment[self.frames.pop():]
+
     def print_env(self, values=True, types=False):
         print('[')
         for scope in self.environment:
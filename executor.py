@@ -0,0 +1,113 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from interpreterv2 import Interpreter
+import frontend
+
+# Runs Brewin programs concurrently on a thread pool, sharing one compiled program between runs.
+#
+# An Interpreter holds two kinds of state. A frontend.Program (tokens, indents, jumps, scope flags,
+# function table) plus the operator tables is never modified once built, so any number of threads
+# can read it at once. Everything a run changes (ip, return stack, environment, output, the
+# per-run caches) lives on the Interpreter. Every worker thread therefore keeps its own Interpreter
+# as its execution context, and hands it the shared Program for each run:
+#
+#   with ProgramExecutor(max_workers=8) as executor:
+#     for result in executor.map(lines, [['1'], ['2'], ['3']]):
+#       print(result.output)
+#
+# Input can be a list of lines or any iterable. An iterable is only read when the program asks for
+# input, so runs blocked on slow input sources (sockets, pipes, queues) overlap with each other and
+# with runs doing work. On free-threaded CPython builds, the runs also execute in parallel.
+
+class RunResult:
+  '''
+  What a run printed and the error it stopped with, if any.
+  '''
+  def __init__(self, output, error_type=None, error_line=None, exception=None):
+    self.output = output
+    self.error_type = error_type
+    self.error_line = error_line
+    self.exception = exception
+
+
+class ThreadInterpreter(Interpreter):
+  '''
+  One worker thread's execution context. It never prints, and it reads input from its run's list
+  or iterable, never from the keyboard.
+  '''
+  def __init__(self, **options):
+    super().__init__(console_output=False, **options)
+    self.input_source = None
+
+  def execute(self, program, input=None):
+    '''Runs a program, given compiled or as its lines.'''
+    self.reset()
+    if input is None or isinstance(input, list):
+      self.input, self.input_source = input, None
+    else:
+      self.input, self.input_source = None, iter(input)
+    if isinstance(program, frontend.Program):
+      self.compiled = program
+      program = program.lines
+    self.run(program)
+
+  def get_input(self):
+    if self.input_source is not None:
+      return next(self.input_source, None)
+    if not self.input:
+      return None  # there's no keyboard to read from
+    return super().get_input()
+
+
+class ProgramExecutor:
+  '''
+  A thread pool running Brewin programs. Keyword options (jit, superinstructions, ...) are passed
+  on to every worker's interpreter.
+  '''
+  def __init__(self, max_workers=None, **options):
+    self.options = options
+    self.pool = ThreadPoolExecutor(max_workers, thread_name_prefix='brewin')
+    self.local = threading.local()
+
+  def compile(self, lines):
+    '''Compiles a program once, for any number of runs on any thread.'''
+    return frontend.compile_program(lines, reachable_only=not self.options.get('coverage'))
+
+  def submit(self, program, input=None):
+    '''
+    Starts a run of a program (a compiled Program, or its lines) and returns a Future of its
+    RunResult. Pass a compiled Program to skip the front end when running it repeatedly.
+    '''
+    return self.pool.submit(self._run, program, input)
+
+  def map(self, program, inputs):
+    '''Runs a program once per input, yielding the RunResults in order.'''
+    if not isinstance(program, frontend.Program):
+      try:
+        program = self.compile(program)
+      except Exception:
+        pass  # every run reports the error
+    futures = [self.submit(program, input) for input in inputs]
+    for future in futures:
+      yield future.result()
+
+  def shutdown(self, wait=True):
+    self.pool.shutdown(wait)
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    self.shutdown()
+
+  def _run(self, program, input):
+    interpreter = getattr(self.local, 'interpreter', None)
+    if interpreter is None:
+      interpreter = self.local.interpreter = ThreadInterpreter(**self.options)
+    exception = None
+    try:
+      interpreter.execute(program, input)
+    except Exception as e:
+      exception = e
+    error_type, error_line = interpreter.get_error_type_and_line()
+    return RunResult(interpreter.get_output(), error_type, error_line, exception)
@@ -0,0 +1,265 @@
+from array import array
+from intbase import InterpreterBase
+from tokenizer import Tokenizer, TokenStore, Keyword
+from func_v1 import FunctionManager
+
+# Single-pass front end: one walk over the source produces everything the interpreter needs before
+# it starts running, instead of InterpreterBase.validate_program, Interpreter._compute_indentation,
+# Tokenizer.tokenize_program and FunctionManager each making their own pass over the program.
+
+CLOSERS = {
+  InterpreterBase.FUNC_DEF: InterpreterBase.ENDFUNC_DEF,
+  InterpreterBase.IF_DEF: InterpreterBase.ENDIF_DEF,
+  InterpreterBase.WHILE_DEF: InterpreterBase.ENDWHILE_DEF,
+}
+ENDS = {InterpreterBase.ENDFUNC_DEF, InterpreterBase.ENDIF_DEF, InterpreterBase.ELSE_DEF, InterpreterBase.ENDWHILE_DEF}
+
+
+class Program:
+  '''
+  A compiled program: the source lines along with, for every line,
+  - tokenized_program: its tokens, in a TokenStore
+  - indents: its indentation
+  - jumps: for if/else/while/endwhile lines, the offset to the line control transfers to when the
+    block is skipped or looped (else/endif, endif, endwhile and while respectively), or 0 if the
+    block is malformed and the interpreter has to search for it
+  - opens_scope/closes_scope: whether the block started/ended on the line declares variables
+  plus the function table, and whether the program passes InterpreterBase.validate_program
+  (None when that isn't known).
+  '''
+  def __init__(self, lines, shared_symbols=None):
+    self.lines = lines
+    self.tokenized_program = TokenStore(shared_symbols)
+    self.indents = array('I')
+    self.jumps = array('i', [0]) * len(lines)
+    self.opens_scope = bytearray(len(lines))
+    self.closes_scope = bytearray(len(lines))
+    self.func_manager = FunctionManager()
+    self.valid_structure = None
+
+
+class BlockAnalyzer:
+  '''
+  Matches if/else/endif and while/endwhile by their nesting, filling in a Program's jumps and scope flags.
+
+  A jump is only recorded when it's the line the interpreter's indentation-based search would find:
+  the opening and closing lines must have the same indentation, and every line in between must be
+  indented further.
+  '''
+  def __init__(self, program):
+    self.program = program
+    self.blocks = []  # [opening line, current branch line, indent, spoiled, else line, keyword] per open block
+
+  def line(self, line_num, keyword, indent):
+    blocks = self.blocks
+    program = self.program
+
+    # Any open block this line isn't indented under can no longer be matched by indentation
+    closing = keyword == InterpreterBase.ELSE_DEF or keyword == InterpreterBase.ENDIF_DEF or keyword == InterpreterBase.ENDWHILE_DEF
+    i = len(blocks) - 2 if closing else len(blocks) - 1
+    while i >= 0 and blocks[i][2] >= indent:
+      blocks[i][3] = True
+      i -= 1
+
+    if keyword == InterpreterBase.IF_DEF or keyword == InterpreterBase.WHILE_DEF:
+      blocks.append([line_num, line_num, indent, False, None, keyword])
+    elif keyword == InterpreterBase.VAR_DEF:
+      if blocks:
+        program.opens_scope[blocks[-1][1]] = 1
+    elif closing:
+      if not blocks:
+        return
+      block = blocks[-1]
+      program.closes_scope[line_num] = program.opens_scope[block[1]]
+      opener = block[5]
+      if block[2] != indent:
+        block[3] = True
+      if keyword == InterpreterBase.ELSE_DEF:
+        if opener != InterpreterBase.IF_DEF or block[4] is not None:
+          block[3] = True
+        block[1] = block[4] = line_num
+        return
+      blocks.pop()
+      if block[3] or CLOSERS[opener] != keyword:
+        return
+      start, end = block[0], line_num
+      if block[4] is not None:
+        program.jumps[start] = block[4] - start
+        program.jumps[block[4]] = end - block[4]
+      else:
+        program.jumps[start] = end - start
+      if keyword == InterpreterBase.ENDWHILE_DEF:
+        program.jumps[end] = start - end
+    elif keyword == InterpreterBase.FUNC_DEF or keyword == InterpreterBase.ENDFUNC_DEF:
+      blocks.clear()
+
+
+class StructureCheck:
+  '''
+  Incremental version of InterpreterBase.validate_program's block and indentation checks. It only
+  decides whether the program is valid; InterpreterBase.validate_program reports the errors.
+  '''
+  def __init__(self):
+    self.blocks = []   # (expected closing keyword, indent)
+    self.indents = []  # indents of the open blocks
+    self.blocks_valid = True
+    self.indentation_done = False
+    self.bad_indentation = None  # line where the indentation check stopped, if it did
+    self.crashes = False         # validate_program raises an IndexError instead of an error
+
+  def line(self, line_num, first_token, indent):
+    if self.blocks_valid:
+      self._check_block(first_token, indent)
+    if not self.indentation_done:
+      self._check_indentation(line_num, first_token, indent)
+
+  def valid(self, line_count):
+    if line_count == 0 or self.crashes:
+      return False
+    return self.blocks_valid and (self.bad_indentation is None or self.bad_indentation >= line_count - 1)
+
+  def _check_block(self, first_token, indent):
+    if first_token in CLOSERS:
+      self.blocks.append((CLOSERS[first_token], indent))
+    elif first_token in ENDS:
+      if not self.blocks:
+        self.blocks_valid = False
+        return
+      closer, block_indent = self.blocks.pop()
+      if first_token == InterpreterBase.ELSE_DEF:
+        if closer == InterpreterBase.ENDIF_DEF and block_indent == indent:
+          self.blocks.append((closer, block_indent))
+        else:
+          self.blocks_valid = False
+      elif closer != first_token or block_indent != indent:
+        self.blocks_valid = False
+
+  def _check_indentation(self, line_num, first_token, indent):
+    indents = self.indents
+    if first_token in CLOSERS:
+      if indents and indent <= indents[-1]:
+        self._stop(line_num)
+        return
+      indents.append(indent)
+    elif not indents:
+      self.indentation_done = True
+      self.crashes = True
+    elif first_token in ENDS:
+      if indent != indents[-1]:
+        self._stop(line_num)
+      elif first_token != InterpreterBase.ELSE_DEF:
+        indents.pop()
+    elif indent <= indents[-1]:
+      self._stop(line_num)
+
+  def _stop(self, line_num):
+    self.indentation_done = True
+    self.bad_indentation = line_num
+
+
+def compile_program(lines, reachable_only=False):
+  '''
+  Runs the whole front end over a program (a list of source lines) in a single pass and returns its Program.
+
+  With reachable_only, the bodies of functions that can't be reached from main are left blank instead
+  of being tokenized and analyzed, and valid_structure is None. That's only done when it can't change
+  how the program runs: if a reachable block couldn't be matched (so the interpreter may search the
+  whole program for its end), the program is compiled in full.
+  '''
+  dead = _dead_lines(lines) if reachable_only else None
+  if not dead:
+    return _compile(lines, None)
+  program = _compile(lines, dead)
+  ops, jumps = program.tokenized_program.ops, program.jumps
+  for line_num, op in enumerate(ops):
+    if (op == Keyword.IF or op == Keyword.ELSE or op == Keyword.WHILE or op == Keyword.ENDWHILE) and not jumps[line_num]:
+      return _compile(lines, None)
+  return program
+
+
+def _compile(lines, dead, first_line=0, check=None):
+  '''
+  Compiles lines that start at line first_line of the program (a whole program unless
+  first_line is given). Error messages, the structure check and function start lines use line
+  numbers in the whole program; the Program's per-line arrays are indexed from the first of lines.
+  With a check given, its line() gets every line's first token and indent and valid_structure is
+  left to the caller.
+  '''
+  program = Program(lines)
+  tokenized_program = program.tokenized_program
+  indents = program.indents
+  blocks = BlockAnalyzer(program)
+  whole_program = check is None
+  if whole_program:
+    check = StructureCheck()
+  for line_num, line in enumerate(lines):
+    if dead is not None and line_num in dead:
+      if '"' in line:
+        Tokenizer._tokenize(first_line + line_num, line.rstrip())  # still reports mismatched quotes
+      tokenized_program.append(())
+      indents.append(0)
+      continue
+    indent = len(line) - len(line.lstrip(' '))
+    tokens = Tokenizer._tokenize(first_line + line_num, line.rstrip())
+    tokenized_program.append(tokens)
+    indents.append(indent)
+    if not tokens:
+      continue
+    # validate_program doesn't know about quotes, so its idea of the first token can differ
+    first_token = tokens[0] if '"' not in line else (line.split(InterpreterBase.COMMENT_DEF)[0].split() or [''])[0]
+    if first_token:
+      check.line(first_line + line_num, first_token, indent)
+    keyword = tokens[0]
+    if keyword == InterpreterBase.FUNC_DEF:
+      program.func_manager.add_function(first_line + line_num, tokens)
+    blocks.line(line_num, keyword, indent)
+  if whole_program:
+    program.valid_structure = check.valid(len(lines)) if dead is None else None
+  return program
+
+
+def _dead_lines(lines):
+  '''
+  Builds the static call graph with a quick scan of the lines starting with `func`, and returns the
+  set of body lines of the functions main can't reach (their headers are kept). Returns None if the
+  scan can't be sure of the graph.
+  '''
+  headers = []   # (line number, function name)
+  defined = {}   # function name -> index in headers of its (last) definition
+  calls = []     # names called from the function of each header
+  for line_num, line in enumerate(lines):
+    stripped = line.lstrip()
+    if not stripped.startswith(InterpreterBase.FUNC_DEF):
+      continue
+    tokens = stripped.split(InterpreterBase.COMMENT_DEF, 1)[0].split()
+    if not tokens or '"' in ' '.join(tokens[:2]):
+      if tokens and tokens[0] in (InterpreterBase.FUNC_DEF, InterpreterBase.FUNCCALL_DEF):
+        return None
+      continue
+    if tokens[0] == InterpreterBase.FUNC_DEF:
+      if len(tokens) < 2:
+        return None
+      defined[tokens[1]] = len(headers)
+      headers.append((line_num, tokens[1]))
+      calls.append(set())
+    elif tokens[0] == InterpreterBase.FUNCCALL_DEF and len(tokens) > 1 and calls:
+      calls[-1].add(tokens[1])
+
+  main = defined.get(InterpreterBase.MAIN_FUNC)
+  if main is None:
+    return None
+  reachable = {main}
+  pending = [main]
+  while pending:
+    for name in calls[pending.pop()]:
+      callee = defined.get(name)
+      if callee is not None and callee not in reachable:
+        reachable.add(callee)
+        pending.append(callee)
+
+  dead = set()
+  for i, (header, _) in enumerate(headers):
+    if i not in reachable:
+      end = headers[i + 1][0] if i + 1 < len(headers) else len(lines)
+      dead.update(range(header + 1, end))
+  return dead
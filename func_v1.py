@@ -12,15 +12,26 @@ class FuncInfo:
         self.start_ip = start_ip    # line number, zero-based
         self.names = []
         self.values = []
+        self.params = []    # (symbol, type, ref) for each parameter, for binding arguments
         self.return_type = None
 
     def add_parameter(self, symbol, value):
         self.names.append(symbol)
         self.values.append(value)
+        self.params.append((symbol, value.type(), value.ref))
 
     def set_return_type(self, return_type):
         self.return_type = return_type
 
+    def shifted(self, offset):
+        '''Returns a copy of this FuncInfo for the same function moved by offset lines.'''
+        func_info = FuncInfo(self.start_ip + offset)
+        func_info.names = self.names
+        func_info.values = self.values
+        func_info.params = self.params
+        func_info.return_type = self.return_type
+        return func_info
+
 class FunctionManager:
     '''
     FunctionManager keeps track of every function in the program, mapping the function name
@@ -29,7 +40,7 @@ class FunctionManager:
     # TODO: verify validity of parameter and return types:
     # valid parameters: int, bool, string, refint, refbool, refstring
     # valid returns: int, bool, string, void
-    def __init__(self, tokenized_program):
+    def __init__(self, tokenized_program=()):
         self.func_cache = {}
         self._cache_function_line_numbers(tokenized_program)
 
@@ -42,31 +53,37 @@ class FunctionManager:
         # Enumerate every line in the tokenized list
         for line_num, line in enumerate(tokenized_program):
             if line and line[0] == InterpreterBase.FUNC_DEF:
-                if len(line) < 3:
-                    InterpreterBase.error(ErrorType.SYNTAX_ERROR, 'Invalid function declaration')
-                # Set the function name and store line_num
-                func_name = line[1]
-                func_info = FuncInfo(line_num + 1)   # function starts executing on line after funcdef
+                self.add_function(line_num, line)
+
+    def add_function(self, line_num, line):
+        '''
+        Registers the function declared by the tokenized `func` line at line_num.
+        '''
+        if len(line) < 3:
+            InterpreterBase.error(ErrorType.SYNTAX_ERROR, 'Invalid function declaration')
+        # Set the function name and store line_num
+        func_name = line[1]
+        func_info = FuncInfo(line_num + 1)   # function starts executing on line after funcdef
 
-                # Set the parameters (symbols & types, including references)
-                for parameter in line[2:-1]:
-                    tokens = parameter.split(':')
-                    if len(tokens) != 2:
-                        InterpreterBase.error(ErrorType.SYNTAX_ERROR, 'Invalid parameter definition')
-                    
-                    symbol, var_type = tokens
-                    value = Value(util.string_to_type(var_type), None)
-                    if 'ref' in var_type:
-                        var_type = util.string_to_type(var_type[3:])
-                        value = Value(var_type, None, ref=True)
-                    func_info.add_parameter(symbol, value)
-                    # print(value.type(), value.value(), value.ref)
+        # Set the parameters (symbols & types, including references)
+        for parameter in line[2:-1]:
+            tokens = parameter.split(':')
+            if len(tokens) != 2:
+                InterpreterBase.error(ErrorType.SYNTAX_ERROR, 'Invalid parameter definition')
+            
+            symbol, var_type = tokens
+            value = Value(util.string_to_type(var_type), None)
+            if 'ref' in var_type:
+                var_type = util.string_to_type(var_type[3:])
+                value = Value(var_type, None, ref=True)
+            func_info.add_parameter(symbol, value)
+            # print(value.type(), value.value(), value.ref)
 
-                # Set the return type of this function
-                func_info.set_return_type(util.string_to_type(line[-1]))
+        # Set the return type of this function
+        func_info.set_return_type(util.string_to_type(line[-1]))
 
-                if func_info.return_type == Type.REFBOOL or func_info.return_type == Type.REFINT or func_info.return_type == Type.REFSTRING:
-                    InterpreterBase.error(ErrorType.TYPE_ERROR, 'Invalid return type')
+        if func_info.return_type == Type.REFBOOL or func_info.return_type == Type.REFINT or func_info.return_type == Type.REFSTRING:
+            InterpreterBase.error(ErrorType.TYPE_ERROR, 'Invalid return type')
 
-                self.func_cache[func_name] = func_info
-       
\ No newline at end of file
+        self.func_cache[func_name] = func_info
+        return func_info
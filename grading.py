@@ -0,0 +1,97 @@
+from interpreterv2 import Interpreter
+
+# Grading mode: instead of collecting a program's whole output and diffing it afterwards, the
+# interpreter is handed the expected output and checks every line as the program prints it,
+# stopping the program at the first line that doesn't match (or that shouldn't be there at all).
+# Only the lines that matched are kept (get_output returns them), so a runaway program printing
+# forever doesn't grow memory past the size of the expected output either.
+
+_END = object()
+
+
+class Mismatch(Exception):
+  '''Raised to stop a program as soon as its output differs from the expected output.'''
+
+
+class GradeResult:
+  '''
+  The outcome of grading a run.
+
+  passed is True if the program printed exactly the expected output and stopped with the expected
+  error (or with no error, if none was expected). Otherwise reason says what went wrong
+  ('output', 'missing output', 'extra output', 'error' or 'exception'), line is the index of the
+  output line where grading stopped, and expected/actual are the values that differed.
+  '''
+  def __init__(self, passed, reason=None, line=None, expected=None, actual=None):
+    self.passed = passed
+    self.reason = reason
+    self.line = line
+    self.expected = expected
+    self.actual = actual
+
+  def __repr__(self):
+    if self.passed:
+      return 'GradeResult(passed)'
+    return f'GradeResult({self.reason} at line {self.line}: expected {self.expected!r}, got {self.actual!r})'
+
+
+class GradingInterpreter(Interpreter):
+  '''
+  Interpreter that compares a program's output against expected_output (any iterable of lines,
+  such as an open file, which is only read as far as the program gets) while it runs.
+
+  expected_error is the (ErrorType, line number) pair the program should stop with, as
+  reported by get_error_type_and_line, or None if it should run to completion.
+
+  After a run, get_output returns the lines that matched, lines_checked counts them, and mismatch
+  is the failing GradeResult if the output differed.
+  '''
+  def __init__(self, expected_output, expected_error=None, input=None, jit=False):
+    super().__init__(console_output=False, input=input, jit=jit)
+    self.expected_output = expected_output
+    self.expected_error = expected_error
+    self.lines_checked = 0
+    self.mismatch = None
+
+  def grade(self, program):
+    '''
+    Runs a program, provided in an array of strings, and returns a GradeResult.
+    '''
+    self.reset()
+    self.expected = iter(self.expected_output)
+    self.lines_checked = 0
+    self.mismatch = None
+    exception = None
+    try:
+      self.run(program)
+    except Mismatch:
+      return self.mismatch
+    except Exception as e:
+      exception = e
+
+    if exception is not None and self.error_type is None:
+      return GradeResult(False, 'exception', self.lines_checked, self.expected_error, exception)
+    expected = self._next_expected()
+    if expected is not _END:
+      return GradeResult(False, 'missing output', self.lines_checked, expected, None)
+    error = (self.error_type, self.error_line) if exception is not None else None
+    if error != self.expected_error:
+      return GradeResult(False, 'error', self.lines_checked, self.expected_error, error)
+    return GradeResult(True)
+
+  def output(self, v):
+    expected = self._next_expected()
+    if expected is _END:
+      self.mismatch = GradeResult(False, 'extra output', self.lines_checked, None, v)
+      raise Mismatch(v)
+    if expected != v:
+      self.mismatch = GradeResult(False, 'output', self.lines_checked, expected, v)
+      raise Mismatch(v)
+    self.output_log.append(v)
+    self.lines_checked += 1
+
+  def _next_expected(self):
+    expected = next(self.expected, _END)
+    if expected is not _END:
+      expected = expected.rstrip('\n')
+    return expected
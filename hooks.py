@@ -0,0 +1,123 @@
+from value import Type
+
+# Execution hooks for programs embedding the interpreter:
+#
+#   interpreter = Interpreter()
+#   interpreter.add_hook('call', lambda interpreter, name, args: print('called', name, args))
+#   interpreter.run(lines)
+#
+# Callbacks get the interpreter first, then:
+# - statement: the line number about to run (zero-based)
+# - call: the function name and {parameter: value} once its arguments are bound (main included)
+# - return: the function name and the value it returned (None for void functions)
+# - assign: the variable (or result register) name and the Value holding it, after an assign
+#   statement. Its value() is the plain Python value; for a long string that joins the pieces it
+#   was built from (see value.StringBuilder), so it's left to callbacks that need it. The Value
+#   is the variable itself, so call value() in the callback to keep the value it had then
+# - output: the text printed
+# - error: the exception, with interpreter.get_error_type_and_line() telling the error type and
+#   line if it's a Brewin error; the exception is raised again once the callbacks return
+# Other values are passed as plain Python ints, bools and strings.
+#
+# Interpreter.run only comes here when hooks are registered, so runs without hooks are unchanged.
+# With hooks, the run loop and interpreter methods are specialized when the run starts: only
+# the events someone subscribed to get a wrapper, and the statement callback is called straight
+# from the loop. Programs with hooks are always interpreted, never transpiled, and coverage
+# (Interpreter(coverage=True)) is recorded as it is without hooks.
+
+RESULT_REGISTERS = {Type.INT: 'resulti', Type.BOOL: 'resultb', Type.STRING: 'results'}
+
+
+def run(interpreter, program):
+  hooks = interpreter.hooks
+  wrapped = _install(interpreter, hooks)
+  try:
+    interpreter._load(program)
+    statement = _dispatch(hooks.get('statement'))
+    line_hits = interpreter.line_hits if interpreter.coverage else None
+    process_line = interpreter._process_line
+    if statement is None and line_hits is None:
+      while not interpreter.terminate:
+        process_line()
+    else:
+      while not interpreter.terminate:
+        line_num = interpreter.ip
+        if line_hits is not None:
+          line_hits[line_num] = 1
+        if statement is not None:
+          statement(interpreter, line_num)
+        process_line()
+  except Exception as e:
+    error = _dispatch(hooks.get('error'))
+    if error is not None:
+      error(interpreter, e)
+    raise
+  finally:
+    for name in wrapped:
+      delattr(interpreter, name)
+
+
+def _dispatch(callbacks):
+  '''Returns a function calling every callback, or None if there are none.'''
+  if not callbacks:
+    return None
+  callbacks = tuple(callbacks)
+  if len(callbacks) == 1:
+    return callbacks[0]
+  def dispatch(*args):
+    for callback in callbacks:
+      callback(*args)
+  return dispatch
+
+
+def _install(interpreter, hooks):
+  '''
+  Wraps the interpreter methods behind the subscribed events with instance attributes, and
+  returns their names so they can be removed after the run.
+  '''
+  wrapped = []
+  call, return_ = _dispatch(hooks.get('call')), _dispatch(hooks.get('return'))
+  assign, output = _dispatch(hooks.get('assign')), _dispatch(hooks.get('output'))
+  functions = []  # names of the functions being run, innermost last
+
+  if call is not None or return_ is not None:
+    find_first_instruction = interpreter._find_first_instruction
+    def hooked_find_first_instruction(funcname, args=[]):
+      start_ip = find_first_instruction(funcname, args)
+      if return_ is not None:
+        functions.append(funcname)
+      if call is not None:
+        func_info = interpreter.func_manager.get_function_info(funcname)
+        scope = interpreter.env_manager.environment[-1]
+        call(interpreter, funcname, {name: scope[name].value() for name, _, _ in func_info.params})
+      return start_ip
+    interpreter._find_first_instruction = hooked_find_first_instruction
+    wrapped.append('_find_first_instruction')
+
+  if return_ is not None:
+    endfunc = interpreter._endfunc
+    def hooked_endfunc(default_return=True):
+      return_type = interpreter.env_manager.return_stack[-1]
+      endfunc(default_return)
+      value = interpreter.env_manager.results.get(RESULT_REGISTERS.get(return_type))
+      return_(interpreter, functions.pop(), value.value() if value is not None else None)
+    interpreter._endfunc = hooked_endfunc
+    wrapped.append('_endfunc')
+
+  if assign is not None:
+    assign_statement = interpreter._assign
+    def hooked_assign(tokens):
+      assign_statement(tokens)
+      assign(interpreter, tokens[0], interpreter._get_value(tokens[0]))
+    interpreter._assign = hooked_assign
+    wrapped.append('_assign')
+
+  if output is not None:
+    print_output = interpreter.output
+    def hooked_output(v):
+      output(interpreter, v)
+      print_output(v)
+    interpreter.output = hooked_output
+    wrapped.append('output')
+
+  return wrapped
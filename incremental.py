@@ -0,0 +1,125 @@
+import bisect
+from difflib import SequenceMatcher
+from intbase import InterpreterBase
+from tokenizer import Tokenizer, Keyword
+from func_v1 import FunctionManager
+import frontend
+
+class IncrementalFrontEnd:
+  '''
+  Front end for hot-reloading edited programs.
+
+  It keeps the Program it compiled last, and given a new version of that program, diffs the two
+  line by line: unchanged lines reuse their old tokens and indentation, and functions whose `func`
+  line didn't change are only moved to their new line numbers. Only inserted or replaced lines are
+  tokenized again, and block structure is only recomputed for the functions containing them (jumps
+  are relative, so they stay valid when a function moves), so the cost of a recompile follows the
+  size of the edit rather than the size of the program.
+  '''
+  def __init__(self):
+    self.compiled = frontend.Program([])
+    self.headers = []    # line numbers of every `func` line, ascending
+    self.functions = []  # the FuncInfo declared by each of those lines
+    self.lines_tokenized = 0  # lines (re)tokenized by the last update, for diagnostics
+
+  def update(self, program):
+    '''
+    Compiles the new version of the program and returns its frontend.Program.
+    '''
+    old = self.compiled
+    compiled = frontend.Program(program, old.tokenized_program)
+    tokenized_program, indents = compiled.tokenized_program, compiled.indents
+    headers, functions = [], []
+    origin = [None] * len(program)  # line number in the old program of every unchanged line
+    edits = []  # (start, end) of every range of inserted or replaced lines, (start, start) for deletions
+    self.lines_tokenized = 0
+    for tag, i1, i2, j1, j2 in self._diff(old.lines, program):
+      if tag == 'equal':
+        tokenized_program.extend(old.tokenized_program, i1, i2)
+        indents += old.indents[i1:i2]
+        origin[j1:j2] = range(i1, i2)
+        first = bisect.bisect_left(self.headers, i1)
+        last = bisect.bisect_left(self.headers, i2)
+        for header, func_info in zip(self.headers[first:last], self.functions[first:last]):
+          headers.append(header + j1 - i1)
+          functions.append(func_info.shifted(j1 - i1))
+      elif tag in ('replace', 'insert'):
+        scratch = FunctionManager()
+        for line_num in range(j1, j2):
+          line = program[line_num]
+          tokens = Tokenizer._tokenize(line_num, line.rstrip())
+          tokenized_program.append(tokens)
+          indents.append(len(line) - len(line.lstrip(' ')))
+          if tokens and tokens[0] == InterpreterBase.FUNC_DEF:
+            headers.append(line_num)
+            functions.append(scratch.add_function(line_num, tokens))
+        edits.append((j1, j2))
+        self.lines_tokenized += j2 - j1
+      elif tag == 'delete':
+        edits.append((j1, j1))
+
+    # Block structure never spans a func line, so it's recomputed one region between func lines at
+    # a time, and copied over for regions that are an unchanged (possibly moved) old region.
+    old_bounds = [0] + self.headers + [len(old.lines)]
+    edit_ends = [edit_end for _, edit_end in edits]
+    bounds = [0] + headers + [len(program)]
+    for start, end in zip(bounds, bounds[1:]):
+      if start == end:
+        continue
+      if self._unchanged(start, end, origin, edits, edit_ends, old_bounds):
+        i = origin[start]
+        compiled.jumps[start:end] = old.jumps[i:i + end - start]
+        compiled.opens_scope[start:end] = old.opens_scope[i:i + end - start]
+        compiled.closes_scope[start:end] = old.closes_scope[i:i + end - start]
+      else:
+        blocks = frontend.BlockAnalyzer(compiled)
+        for line_num in range(start, end):
+          if tokenized_program.ops[line_num] != Keyword.NONE:
+            blocks.line(line_num, tokenized_program.token(line_num, 0), indents[line_num])
+
+    # Later definitions of a function replace earlier ones, as in FunctionManager
+    for header, func_info in zip(headers, functions):
+      compiled.func_manager.func_cache[tokenized_program.token(header, 1)] = func_info
+
+    self.compiled = compiled
+    self.headers = headers
+    self.functions = functions
+    return compiled
+
+  def _unchanged(self, start, end, origin, edits, edit_ends, old_bounds):
+    '''
+    Whether the region [start, end) of the new program is a region of the old program moved as a whole.
+    '''
+    i = origin[start]
+    if i is None:
+      return False
+    edit = bisect.bisect_right(edit_ends, start)
+    if edit < len(edits) and edits[edit][0] < end:
+      return False
+    # every line has to come from the same old lines in the same order: origin only increases, so
+    # that's the case when the last line is as far from the first one in both programs
+    if origin[end - 1] != i + end - 1 - start:
+      return False
+    # and they have to be a whole old region, not part of one or parts of two
+    bound = bisect.bisect_right(old_bounds, i) - 1
+    return old_bounds[bound] == i and bound + 1 < len(old_bounds) and old_bounds[bound + 1] == i + end - start
+
+  def _diff(self, old, new):
+    '''
+    Line diff opcodes between two programs. Edits are usually one contiguous region, so the common
+    prefix and suffix are skipped before handing the rest to SequenceMatcher.
+    '''
+    limit = min(len(old), len(new))
+    prefix = 0
+    while prefix < limit and old[prefix] == new[prefix]:
+      prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old[-1 - suffix] == new[-1 - suffix]:
+      suffix += 1
+
+    opcodes = [('equal', 0, prefix, 0, prefix)]
+    matcher = SequenceMatcher(None, old[prefix:len(old) - suffix], new[prefix:len(new) - suffix], autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+      opcodes.append((tag, i1 + prefix, i2 + prefix, j1 + prefix, j2 + prefix))
+    opcodes.append(('equal', len(old) - suffix, len(old), len(new) - suffix, len(new)))
+    return opcodes
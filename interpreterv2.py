@@ -1,31 +1,109 @@
-from enum import Enum
 from intbase import InterpreterBase, ErrorType
-from value import Type, Value
-from env_v1 import EnvironmentManager
-from tokenizer import Tokenizer
-from func_v1 import FunctionManager
+from value import Type, Value, concat
+from env_v1 import EnvironmentManager, RESULT_NAMES
+import frontend
+from tokenizer import Keyword
+
+# incremental, transpiler, superinst and hooks are imported when an interpreter first uses them, so
+# plain runs don't pay for difflib, hashlib and json at startup.
+
+# code to run for different operators on different types
+BINARY_OP_LIST = ['+','-','*','/','%','==','!=', '<', '<=', '>', '>=', '&', '|']
+BINARY_OPS = {}
+BINARY_OPS[Type.INT] = {
+  '+': lambda a,b: Value(Type.INT, a.value()+b.value()),
+  '-': lambda a,b: Value(Type.INT, a.value()-b.value()),
+  '*': lambda a,b: Value(Type.INT, a.value()*b.value()),
+  '/': lambda a,b: Value(Type.INT, a.value()//b.value()),  # // for integer ops
+  '%': lambda a,b: Value(Type.INT, a.value()%b.value()),
+  '==': lambda a,b: Value(Type.BOOL, a.value()==b.value()),
+  '!=': lambda a,b: Value(Type.BOOL, a.value()!=b.value()),
+  '>': lambda a,b: Value(Type.BOOL, a.value()>b.value()),
+  '<': lambda a,b: Value(Type.BOOL, a.value()<b.value()),
+  '>=': lambda a,b: Value(Type.BOOL, a.value()>=b.value()),
+  '<=': lambda a,b: Value(Type.BOOL, a.value()<=b.value()),
+}
+BINARY_OPS[Type.STRING] = {
+  '+': lambda a,b: Value(Type.STRING, concat(a.v, b.v)),  # builds long strings without copying
+  '==': lambda a,b: Value(Type.BOOL, a.value()==b.value()),
+  '!=': lambda a,b: Value(Type.BOOL, a.value()!=b.value()),
+  '>': lambda a,b: Value(Type.BOOL, a.value()>b.value()),
+  '<': lambda a,b: Value(Type.BOOL, a.value()<b.value()),
+  '>=': lambda a,b: Value(Type.BOOL, a.value()>=b.value()),
+  '<=': lambda a,b: Value(Type.BOOL, a.value()<=b.value()),
+}
+BINARY_OPS[Type.BOOL] = {
+  '&': lambda a,b: Value(Type.BOOL, a.value() and b.value()),
+  '==': lambda a,b: Value(Type.BOOL, a.value()==b.value()),
+  '!=': lambda a,b: Value(Type.BOOL, a.value()!=b.value()),
+  '|': lambda a,b: Value(Type.BOOL, a.value() or b.value())
+}
+
+# events callbacks can be registered for with Interpreter.add_hook
+HOOK_EVENTS = ('statement', 'call', 'return', 'assign', 'output', 'error')
 
 class Interpreter(InterpreterBase):
   '''
   Main interpreter class
   '''
-  def __init__(self, console_output=True, input=None, trace_output=False):
+  def __init__(self, console_output=True, input=None, trace_output=False, jit=False, incremental=False, coverage=False,
+               superinstructions=False):
     super().__init__(console_output, input)
     self._setup_operations()  # setup all valid binary operations and the types they work on
     self.trace_output = trace_output
+    self.jit = jit  # run programs through the transpiler backend when possible
+    # when set, each run only recompiles what changed since the previous program run
+    self.front_end = None
+    if incremental:
+      from incremental import IncrementalFrontEnd
+      self.front_end = IncrementalFrontEnd()
+    self.compiled = None  # frontend.Program of the last program validated or run
+    # when set, runs record every line executed in line_hits and every call in call_counts (see linecov.py)
+    self.coverage = coverage
+    self.line_hits = None
+    self.call_counts = None
+    # when set, the first run of a program profiles it and later runs use superinstructions (see superinst.py)
+    self.superinstructions = superinstructions
+    self.hooks = {}  # event -> callbacks registered with add_hook (see hooks.py)
+
+  def add_hook(self, event, callback):
+    '''
+    Registers a callback for one of HOOK_EVENTS, to be called during later runs (see hooks.py for
+    the arguments each event passes). Runs without hooks don't pay anything for this.
+    '''
+    if event not in HOOK_EVENTS:
+      raise ValueError(f'Unknown hook event {event!r}, expected one of {", ".join(HOOK_EVENTS)}')
+    self.hooks.setdefault(event, []).append(callback)
+
+  def remove_hook(self, event, callback):
+    callbacks = self.hooks.get(event, [])
+    if callback in callbacks:
+      callbacks.remove(callback)
+    if not callbacks:
+      self.hooks.pop(event, None)
 
   def run(self, program):
     '''
     Run a program, provided in an array of strings, one string per line of source code.
     '''
-    self.program = program
-    self.env_manager = EnvironmentManager() # used to track variables/scope
-    self._compute_indentation(program)  # determine indentation of every line
-    self.tokenized_program = Tokenizer.tokenize_program(program)
-    self.func_manager = FunctionManager(self.tokenized_program)
-    self.ip = self._find_first_instruction(InterpreterBase.MAIN_FUNC)
-    self.return_stack = []
-    self.terminate = False
+    if self.hooks:
+      import hooks
+      hooks.run(self, program)
+      return
+    if self.jit and not self.trace_output and not self.coverage and self._run_transpiled(program):
+      return
+    if self.superinstructions and not self.trace_output and not self.coverage:
+      import superinst
+      superinst.run(self, program)
+      return
+    self._load(program)
+
+    if self.coverage:
+      line_hits = self.line_hits
+      while not self.terminate:
+        line_hits[self.ip] = 1
+        self._process_line()
+      return
 
     # main interpreter run loop
     while not self.terminate:
@@ -33,50 +111,133 @@ class Interpreter(InterpreterBase):
     
     # self.env_manager.print_env()
 
+  def _load(self, program):
+    '''
+    Runs the front end over a program and sets up the state to start executing main.
+    '''
+    self.env_manager = EnvironmentManager() # used to track variables/scope
+    if self.front_end is not None:
+      compiled = self.front_end.update(program)
+    elif self.compiled is not None and self.compiled.lines is program:
+      compiled = self.compiled  # already compiled by validate_program
+    else:
+      # coverage needs every function's lines, reached or not
+      compiled = frontend.compile_program(program, reachable_only=not self.coverage)
+    self.compiled = compiled
+    self.program = compiled.lines
+    self.tokenized_program = compiled.tokenized_program
+    self.ops = compiled.tokenized_program.ops
+    self.line_args = {}  # line number -> decoded arguments, for the lines executed so far
+    self.indents = compiled.indents
+    self.jumps = compiled.jumps
+    self.opens_scope = compiled.opens_scope
+    self.closes_scope = compiled.closes_scope
+    self.func_manager = compiled.func_manager
+    self.call_sites = {}  # line number -> FuncInfo of the function called there
+    if self.coverage:
+      self.line_hits = bytearray(len(compiled.lines))
+      self.call_counts = dict.fromkeys(compiled.func_manager.func_cache, 0)
+    self.ip = None
+    self.ip = self._find_first_instruction(InterpreterBase.MAIN_FUNC)
+    self.return_stack = []
+    self.terminate = False
+
+  def _run_transpiled(self, program):
+    '''
+    Runs the program as Python code generated by the transpiler. Returns False without running
+    anything if the program uses something the transpiler doesn't support.
+    '''
+    import transpiler
+    compiled = transpiler.compile_program(program)
+    if compiled is None:
+      return False
+    read = []
+    try:
+      transpiler.execute(self, compiled, read)
+    except RecursionError:
+      # deeper than the Python stack allows, which the interpreter's own call stack has no limit on
+      self._rerun(program, read)
+    return True
+
+  def _rerun(self, program, read):
+    '''
+    Runs a program from the start in the interpreter after the transpiled code gave up on it. Runs
+    are deterministic, so it gets the input already read again instead of reading more, and the
+    lines already printed aren't printed again.
+    '''
+    printed = len(self.output_log)
+    input_cursor = self.input_cursor
+    self.reset()
+    self.input_cursor = input_cursor
+    pending = read[::-1]
+    read_more, print_more = self.get_input, self.output
+    def get_input():
+      return pending.pop() if pending else read_more()
+    def output(v):
+      if len(self.output_log) < printed:
+        self.output_log.append(v)
+      else:
+        print_more(v)
+    self.get_input, self.output = get_input, output
+    try:
+      self._load(program)
+      while not self.terminate:
+        self._process_line()
+    finally:
+      del self.get_input, self.output
+
+  def validate_program(self, program):
+    '''
+    Checks the program's blocks and indentation. The check is part of the front end's single pass,
+    so the compiled program is kept for run() to reuse, and only invalid programs get rescanned
+    by InterpreterBase to report the error.
+    '''
+    try:
+      self.compiled = frontend.compile_program(program)
+    except Exception:
+      self.compiled = None
+    if self.compiled is None or not self.compiled.valid_structure:
+      super().validate_program(program)
+
   def _process_line(self):
     # TODO: remove
     # self.env_manager.print_env(types=True)
     if self.trace_output:
       print(f"{self.ip:04}: {self.program[self.ip].rstrip()}")
-    tokens = self.tokenized_program[self.ip]
-    if not tokens:
+    op = self.ops[self.ip]
+    if op == Keyword.NONE:
       self._blank_line()
       return
 
-    args = tokens[1:]
+    args = self.line_args.get(self.ip)
+    if args is None:
+      args = self.line_args[self.ip] = self.tokenized_program.args(self.ip)
 
-    match tokens[0]:
-      case InterpreterBase.VAR_DEF:
+    match op:
+      case Keyword.VAR:
         self._var(args)
-      case InterpreterBase.ASSIGN_DEF:
+      case Keyword.ASSIGN:
         self._assign(args)
-      case InterpreterBase.FUNCCALL_DEF:
-        self.env_manager.push_scope()
+      case Keyword.FUNCCALL:
         self._funccall(args)
-      case InterpreterBase.ENDFUNC_DEF:
+      case Keyword.ENDFUNC:
         self._endfunc()
-        self.env_manager.pop_scope()
-      case InterpreterBase.IF_DEF:
-        self.env_manager.push_scope()
+        self.env_manager.pop_frame()
+      case Keyword.IF:
         self._if(args)
-      case InterpreterBase.ELSE_DEF:
-        self.env_manager.pop_scope()
-        self.env_manager.push_scope()
+      case Keyword.ELSE:
         self._else()
-      case InterpreterBase.ENDIF_DEF:
+      case Keyword.ENDIF:
         self._endif()
-        self.env_manager.pop_scope()
-      case InterpreterBase.RETURN_DEF:
+      case Keyword.RETURN:
         self._return(args)
-        self.env_manager.pop_scope()
-      case InterpreterBase.WHILE_DEF:
-        self.env_manager.push_scope()
+        self.env_manager.pop_frame()
+      case Keyword.WHILE:
         self._while(args)
-      case InterpreterBase.ENDWHILE_DEF:
+      case Keyword.ENDWHILE:
         self._endwhile(args)
-        self.env_manager.pop_scope()
       case default:
-        raise Exception(f'Unknown command: {tokens[0]}')
+        raise Exception(f'Unknown command: {self.tokenized_program.token(self.ip, 0)}')
 
   def _blank_line(self):
     self._advance_to_next_statement()
@@ -121,6 +282,12 @@ class Interpreter(InterpreterBase):
 
     if len(tokens) < 2:
       super().error(ErrorType.SYNTAX_ERROR, 'Invalid assignment statement') #no
+    if var_name in self.env_manager.results and not (self.env_manager.results_shadowed and self.env_manager.exists(var_name)):
+      if self.env_manager.results[var_name].type() != value.type():
+        super().error(ErrorType.TYPE_ERROR, f'Mismatching types {self.env_manager.results[var_name].type()} and {value.type()}', self.ip)
+      self.env_manager.set_return(var_name, value)
+      self._advance_to_next_statement()
+      return
     if not self.env_manager.exists(var_name):
       super().error(ErrorType.NAME_ERROR, f'Unable to locate variable: `{var_name}`', self.ip)
     env_var_type = self.env_manager.get(var_name).type()
@@ -134,23 +301,17 @@ class Interpreter(InterpreterBase):
     if not args:
       super().error(ErrorType.SYNTAX_ERROR,"Missing function name to call", self.ip) #!
     
-    # TODO: after built-in functions (print, input, etc) are run, the env_manager
-    # pops the most recent scope manually since the IP doesn't run into any
-    # returns in the code. Find a cleaner way to implement this functionality.
-
     if args[0] == InterpreterBase.PRINT_DEF:
       self._print(args[1:])
-      self.env_manager.pop_scope()
       self._advance_to_next_statement()
     elif args[0] == InterpreterBase.INPUT_DEF:
       self._input(args[1:])
-      self.env_manager.pop_scope()
       self._advance_to_next_statement()
     elif args[0] == InterpreterBase.STRTOINT_DEF:
       self._strtoint(args[1:])
-      self.env_manager.pop_scope()
       self._advance_to_next_statement()
     else:
+      self.env_manager.push_frame()
       self.return_stack.append(self.ip+1)
       self.ip = self._find_first_instruction(args[0], args[1:])
 
@@ -179,29 +340,42 @@ class Interpreter(InterpreterBase):
       super().error(ErrorType.TYPE_ERROR,"Non-boolean if expression", self.ip) #!
     
     if value_type.value():
+      if self.opens_scope[self.ip]:
+        self.env_manager.push_scope()
       self._advance_to_next_statement()
       return
     else:
-      for line_num in range(self.ip+1, len(self.tokenized_program)):
-        tokens = self.tokenized_program[line_num]
-        if not tokens:
-          continue
-        if (tokens[0] == InterpreterBase.ENDIF_DEF or tokens[0] == InterpreterBase.ELSE_DEF) and self.indents[self.ip] == self.indents[line_num]:
+      if self.jumps[self.ip]:
+        line_num = self.ip + self.jumps[self.ip]
+        if self.ops[line_num] == Keyword.ELSE and self.opens_scope[line_num]:
+          self.env_manager.push_scope()
+        self.ip = line_num + 1
+        return
+      # the front end couldn't match this block, so search for its end
+      for line_num in range(self.ip+1, len(self.ops)):
+        op = self.ops[line_num]
+        if (op == Keyword.ENDIF or op == Keyword.ELSE) and self.indents[self.ip] == self.indents[line_num]:
+          if op == Keyword.ELSE and self.opens_scope[line_num]:
+            self.env_manager.push_scope()
           self.ip = line_num + 1
           return
     super().error(ErrorType.SYNTAX_ERROR,"Missing endif", self.ip) #no
 
   def _endif(self):
+    if self.closes_scope[self.ip]:
+      self.env_manager.pop_scope()
     self._advance_to_next_statement()
 
   def _else(self):
-    for line_num in range(self.ip+1, len(self.tokenized_program)):
-      tokens = self.tokenized_program[line_num]
-      if not tokens:
-        continue
-      if tokens[0] == InterpreterBase.ENDIF_DEF and self.indents[self.ip] == self.indents[line_num]:
+    # reached the end of the if branch, so skip the else branch
+    if self.closes_scope[self.ip]:
+      self.env_manager.pop_scope()
+    if self.jumps[self.ip]:
+      self.ip += self.jumps[self.ip] + 1
+      return
+    for line_num in range(self.ip+1, len(self.ops)):
+      if self.ops[line_num] == Keyword.ENDIF and self.indents[self.ip] == self.indents[line_num]:
           self.ip = line_num + 1
-          self.env_manager.pop_scope()
           return
     super().error(ErrorType.SYNTAX_ERROR,"Missing endif", self.ip) #no
 
@@ -210,9 +384,8 @@ class Interpreter(InterpreterBase):
     Returns a value for user-defined functions.
 
     If a return were to happen within a nested scope (such as an if-statement within the function),
-    the scopes created by these structures must be destroyed before moving on. Therefore this function
-    will parse through the rest of the user-defined function until it finds an `endfunc` statement,
-    while doing so it will pop a scope for every `end` statement it finds.
+    the scopes created by these structures must be destroyed before moving on. The caller does this
+    by popping the function's frame, which drops every scope opened since the function was called.
     '''
     return_type = self.env_manager.return_stack[-1]
 
@@ -234,17 +407,6 @@ class Interpreter(InterpreterBase):
     # Set the respective global result variable with return value
     symbol = {Type.INT : 'resulti', Type.BOOL : 'resultb', Type.STRING : 'results'}[value.type()]
     self.env_manager.set_return(symbol, value)
-
-    # When returning, we must break out of any nested structures within the function
-    # by clearing any scoped environments until we find ENDFUNC
-    for line_num in range(self.ip + 1, len(self.tokenized_program)):
-      tokens = self.tokenized_program[line_num]
-      if not tokens:
-        continue
-      if tokens[0] == InterpreterBase.ENDIF_DEF or tokens[0] == InterpreterBase.ENDWHILE_DEF:
-        self.env_manager.pop_scope()
-      if tokens[0] == InterpreterBase.ENDFUNC_DEF:
-        break
     self._endfunc(default_return=False)
 
   def _while(self, args):
@@ -258,30 +420,39 @@ class Interpreter(InterpreterBase):
       return
 
     # If true, we advance to the next statement
+    if self.opens_scope[self.ip]:
+      self.env_manager.push_scope()
     self._advance_to_next_statement()
 
   def _exit_while(self):
+    if self.jumps[self.ip]:
+      self.ip += self.jumps[self.ip] + 1
+      return
     while_indent = self.indents[self.ip]
     cur_line = self.ip + 1
-    while cur_line < len(self.tokenized_program):
-      if len(self.tokenized_program[cur_line]) > 0 and self.tokenized_program[cur_line][0] == InterpreterBase.ENDWHILE_DEF and self.indents[cur_line] == while_indent:
+    while cur_line < len(self.ops):
+      if self.ops[cur_line] == Keyword.ENDWHILE and self.indents[cur_line] == while_indent:
         self.ip = cur_line + 1
-        self.env_manager.pop_scope()
         return
-      if self.tokenized_program[cur_line] and self.indents[cur_line] < self.indents[self.ip]:
+      if self.ops[cur_line] != Keyword.NONE and self.indents[cur_line] < self.indents[self.ip]:
         break # syntax error!
       cur_line += 1
     # didn't find endwhile
     super().error(ErrorType.SYNTAX_ERROR,"Missing endwhile", self.ip) #no
 
   def _endwhile(self, args):
+    if self.closes_scope[self.ip]:
+      self.env_manager.pop_scope()
+    if self.jumps[self.ip]:
+      self.ip += self.jumps[self.ip]
+      return
     while_indent = self.indents[self.ip]
     cur_line = self.ip - 1
     while cur_line >= 0:
-      if len(self.tokenized_program[cur_line]) > 0 and self.tokenized_program[cur_line][0] == InterpreterBase.WHILE_DEF and self.indents[cur_line] == while_indent:
+      if self.ops[cur_line] == Keyword.WHILE and self.indents[cur_line] == while_indent:
         self.ip = cur_line
         return
-      if self.tokenized_program[cur_line] and self.indents[cur_line] < self.indents[self.ip]:
+      if self.ops[cur_line] != Keyword.NONE and self.indents[cur_line] < self.indents[self.ip]:
         break # syntax error!
       cur_line -= 1
     # didn't find while
@@ -294,13 +465,15 @@ class Interpreter(InterpreterBase):
     for arg in args:
       val_type = self._get_value(arg)
       out.append(str(val_type.value()))
-    super().output(''.join(out))
+    self.output(''.join(out))
 
   def _input(self, args):
     if args:
       self._print(args)
-    result = super().get_input()
-    self.env_manager.set_return(InterpreterBase.RESULT_DEF + 's', Value(Type.STRING, result)) # return always passed back in `results`` 
+    self._store_input(self.get_input())  # through self, so subclasses like the daemon's can supply input
+
+  def _store_input(self, result):
+    self.env_manager.set_return(InterpreterBase.RESULT_DEF + 's', Value(Type.STRING, result)) # return always passed back in `results``
 
   def _strtoint(self, args):
     if len(args) != 1:
@@ -314,87 +487,61 @@ class Interpreter(InterpreterBase):
     # for now just increment IP, but later deal with loops, returns, end of functions, etc.
     self.ip += 1
 
-  # create a lookup table of code to run for different operators on different types
   def _setup_operations(self):
     '''
-    Creates a lookup table of code to run for different operators on different types.
+    Sets up the lookup table of code to run for different operators on different types. The
+    table is built once, when the module is imported, and shared by every interpreter.
     '''
-    self.binary_op_list = ['+','-','*','/','%','==','!=', '<', '<=', '>', '>=', '&', '|']
-    self.binary_ops = {}
-    self.binary_ops[Type.INT] = {
-     '+': lambda a,b: Value(Type.INT, a.value()+b.value()),
-     '-': lambda a,b: Value(Type.INT, a.value()-b.value()),
-     '*': lambda a,b: Value(Type.INT, a.value()*b.value()),
-     '/': lambda a,b: Value(Type.INT, a.value()//b.value()),  # // for integer ops
-     '%': lambda a,b: Value(Type.INT, a.value()%b.value()),
-     '==': lambda a,b: Value(Type.BOOL, a.value()==b.value()),
-     '!=': lambda a,b: Value(Type.BOOL, a.value()!=b.value()),
-     '>': lambda a,b: Value(Type.BOOL, a.value()>b.value()),
-     '<': lambda a,b: Value(Type.BOOL, a.value()<b.value()),
-     '>=': lambda a,b: Value(Type.BOOL, a.value()>=b.value()),
-     '<=': lambda a,b: Value(Type.BOOL, a.value()<=b.value()),
-    }
-    self.binary_ops[Type.STRING] = {
-     '+': lambda a,b: Value(Type.STRING, a.value()+b.value()),
-     '==': lambda a,b: Value(Type.BOOL, a.value()==b.value()),
-     '!=': lambda a,b: Value(Type.BOOL, a.value()!=b.value()),
-     '>': lambda a,b: Value(Type.BOOL, a.value()>b.value()),
-     '<': lambda a,b: Value(Type.BOOL, a.value()<b.value()),
-     '>=': lambda a,b: Value(Type.BOOL, a.value()>=b.value()),
-     '<=': lambda a,b: Value(Type.BOOL, a.value()<=b.value()),
-    }
-    self.binary_ops[Type.BOOL] = {
-     '&': lambda a,b: Value(Type.BOOL, a.value() and b.value()),
-     '==': lambda a,b: Value(Type.BOOL, a.value()==b.value()),
-     '!=': lambda a,b: Value(Type.BOOL, a.value()!=b.value()),
-     '|': lambda a,b: Value(Type.BOOL, a.value() or b.value())
-    }
-
-  def _compute_indentation(self, program):
-    self.indents = [len(line) - len(line.lstrip(' ')) for line in program]
+    self.binary_op_list = BINARY_OP_LIST
+    self.binary_ops = BINARY_OPS
 
   def _find_first_instruction(self, funcname, args=[]):
-    func_info = self.func_manager.get_function_info(funcname)
-    if func_info == None:
-      super().error(ErrorType.NAME_ERROR,f"Unable to locate {funcname} function", self.ip) #!
-
-    # Check if argument length matches
-    if len(func_info.names) != len(args):
-        super().error(ErrorType.NAME_ERROR, 'Invalid number of arguments supplied', self.ip)
-    
-    # Add parameters to scope
-    param_names, vars = [], []
-    for i in range(len(args)):
-      var_name, param_name = args[i], func_info.names[i]
-      
-      #if not self.env_manager.exists(var_name):
-      #  super().error(ErrorType.NAME_ERROR,f'Unknown variable {var_name}', self.ip) #!
+    func_info = self.call_sites.get(self.ip)
+    if func_info is None:
+      func_info = self._resolve_call(funcname, args)
+    if self.call_counts is not None:
+      self.call_counts[funcname] += 1
+
+    # Evaluate the arguments in the caller's scope before binding any of them, since
+    # a parameter may have the same name as a later argument
+    values = []
+    for var_name, (param_name, param_type, ref) in zip(args, func_info.params):
       var = self._get_value(var_name)
-      
       # Check if var_type matches parameter type
-      if var.type() != func_info.values[i].type():
+      if var.t != param_type:
         super().error(ErrorType.TYPE_ERROR, 'Invalid argument type supplied', self.ip)
-
-
-      param_names.append(param_name)
-      if func_info.values[i].ref:
-        vars.append(var)
-      else:
-        vars.append(var.deepcopy())
-        # self.env_manager.add(param_name, var.deepcopy())
-
-    # TODO: check back on env clearing
-    # if funcname != InterpreterBase.MAIN_FUNC:
-    #   self.env_manager.clear_environment()
-
-    for i in range(len(param_names)):
-      self.env_manager.add(param_names[i], vars[i])
+      # Assignment rebinds the payload (.v) of the Value a name is bound to and never mutates the
+      # payload itself (a StringBuilder copies before appending to a shared one). So a by-value
+      # parameter needs a Value of its own, but can share the caller's payload without a deep copy.
+      values.append(var if ref else Value(var.t, var.v))
+
+    scope = self.env_manager.environment[-1]
+    for (param_name, _, _), value in zip(func_info.params, values):
+      scope[param_name] = value
     
     # Store what the return type is
     self.env_manager.return_stack.append(func_info.return_type)
 
     return func_info.start_ip
 
+  def _resolve_call(self, funcname, args):
+    '''
+    Looks up and validates the function called on the current line. The function and its arity
+    can't change between calls, so this only runs the first time each call site is executed.
+    '''
+    func_info = self.func_manager.get_function_info(funcname)
+    if func_info == None:
+      super().error(ErrorType.NAME_ERROR,f"Unable to locate {funcname} function", self.ip) #!
+
+    # Check if argument length matches
+    if len(func_info.names) != len(args):
+        super().error(ErrorType.NAME_ERROR, 'Invalid number of arguments supplied', self.ip)
+
+    if not RESULT_NAMES.isdisjoint(func_info.names):
+      self.env_manager.results_shadowed = True  # a parameter hides a result register
+    self.call_sites[self.ip] = func_info
+    return func_info
+
   def _get_value(self, token):
     '''
     Given a token name (e.g., x, 17, True, "foo"), give us a Value object associated with it.
@@ -407,7 +554,7 @@ class Interpreter(InterpreterBase):
       return Value(Type.INT, int(token))
     if token == InterpreterBase.TRUE_DEF or token == InterpreterBase.FALSE_DEF:
       return Value(Type.BOOL, token == InterpreterBase.TRUE_DEF)
-    value = self.env_manager.get(token)
+    value = self.env_manager.lookup(token)
     if value  == None:
       super().error(ErrorType.NAME_ERROR,f"Unknown variable {token}", self.ip) #!
     return value
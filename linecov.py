@@ -0,0 +1,89 @@
+import json
+import sys
+from interpreterv2 import Interpreter
+from tokenizer import Keyword
+
+# Line coverage and call statistics for Brewin programs. Run a program with
+# Interpreter(coverage=True), which marks every line it executes in a bytearray indexed by line
+# number and counts the calls to every function, then export the results:
+#
+#   interpreter = Interpreter(coverage=True)
+#   interpreter.run(lines)
+#   report = CoverageReport.from_interpreter(interpreter, 'program.src')
+#   report.to_lcov()  # or report.to_json()
+#
+# Line numbers in reports start at 1, as editors and lcov tools expect.
+
+class CoverageReport:
+  '''
+  Coverage of one run: which executable lines ran, and how many times each function was called.
+  Function headers, blank lines and comments aren't executable.
+  '''
+  def __init__(self, compiled, line_hits, call_counts, source_name='program.src'):
+    self.source_name = source_name
+    ops = compiled.tokenized_program.ops
+    self.lines = {line_num + 1: line_hits[line_num] for line_num, op in enumerate(ops)
+                  if op != Keyword.NONE and op != Keyword.FUNC}
+    # function name -> (line of its header, calls)
+    self.functions = {name: (func_info.start_ip, call_counts.get(name, 0))
+                      for name, func_info in compiled.func_manager.func_cache.items()}
+
+  @classmethod
+  def from_interpreter(cls, interpreter, source_name='program.src'):
+    '''Builds the report for the last program an Interpreter(coverage=True) ran.'''
+    if interpreter.line_hits is None:
+      raise ValueError('The interpreter has no coverage data: create it with coverage=True and run a program')
+    return cls(interpreter.compiled, interpreter.line_hits, interpreter.call_counts, source_name)
+
+  def covered(self):
+    return sum(self.lines.values())
+
+  def to_json(self):
+    return json.dumps({
+      'source': self.source_name,
+      'lines': {str(line): hit for line, hit in self.lines.items()},
+      'functions': {name: {'line': line, 'calls': calls} for name, (line, calls) in self.functions.items()},
+      'covered': self.covered(),
+      'total': len(self.lines),
+    }, indent=2)
+
+  def to_lcov(self):
+    records = ['TN:', f'SF:{self.source_name}']
+    for name, (line, calls) in self.functions.items():
+      records.append(f'FN:{line},{name}')
+    for name, (line, calls) in self.functions.items():
+      records.append(f'FNDA:{calls},{name}')
+    records.append(f'FNF:{len(self.functions)}')
+    records.append(f'FNH:{sum(1 for _, calls in self.functions.values() if calls)}')
+    for line, hit in self.lines.items():
+      records.append(f'DA:{line},{hit}')
+    records.append(f'LF:{len(self.lines)}')
+    records.append(f'LH:{self.covered()}')
+    records.append('end_of_record')
+    return '\n'.join(records) + '\n'
+
+
+def main():
+  '''
+  Runs a program like test.py does and writes its coverage:
+    python linecov.py program.src [report.info | report.json]
+  The report is lcov unless its name ends in .json; without one, a summary is printed instead.
+  '''
+  with open(sys.argv[1], 'r') as file:
+    lines = file.readlines()
+  interpreter = Interpreter(coverage=True)
+  try:
+    interpreter.run(lines)
+  finally:
+    if interpreter.line_hits is not None:
+      _write_report(CoverageReport.from_interpreter(interpreter, sys.argv[1]), sys.argv[2] if len(sys.argv) > 2 else None)
+
+def _write_report(report, path):
+  if path is None:
+    print(f'{report.covered()}/{len(report.lines)} lines covered', file=sys.stderr)
+    return
+  with open(path, 'w') as file:
+    file.write(report.to_json() if path.endswith('.json') else report.to_lcov())
+
+if __name__ == '__main__':
+  main()
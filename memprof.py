@@ -0,0 +1,301 @@
+import bisect
+import json
+import sys
+import tracemalloc
+from intbase import InterpreterBase
+from interpreterv2 import Interpreter
+from value import Type, StringBuilder
+
+RESULT_TYPES = (Type.INT, Type.BOOL, Type.STRING)  # return types with a default return value
+
+# Memory profiling for Brewin programs. Python tools can only say that memory goes to
+# Value.__init__ or push_scope; this runs a program statement by statement and charges what each
+# statement allocates to the Brewin line (and so the function) that ran it:
+#
+#   profiler = MemoryProfiler()
+#   profiler.run(Interpreter(), lines)
+#   print(profiler.to_text())  # or profiler.to_json()
+#
+# For every line it counts Values created, scopes pushed (function frames included), bytes of
+# string data in new string Values, and how many bytes traced memory grew by (tracemalloc). Every
+# `interval` statements it also samples traced memory, the peak since the previous sample, the
+# running line and the call depth (the length of Interpreter.return_stack), giving a timeline
+# of the run.
+#
+# Values and scopes are counted by wrapping, on the profiled interpreter only, the methods and
+# operator tables that create them (see _install_counters), so other interpreters running at the
+# same time aren't affected. Line numbers in reports start at 1.
+
+class MemoryProfiler:
+  '''
+  Memory used by one program run, by line and over time.
+  '''
+  def __init__(self, interval=1000):
+    self.interval = interval
+    self.sites = {}  # line number -> [statements, values, scopes, string bytes, allocated bytes]
+    self.timeline = []  # (statements run, traced bytes, peak bytes since the last sample, line, call depth)
+    self.statements = 0
+    self.compiled = None
+    self.function_starts = []  # (first line, name) of every function, in line order
+
+  def run(self, interpreter, program):
+    '''
+    Runs a program on an interpreter while profiling it. What was recorded up to an error is
+    kept, so the report can still be read when the program fails.
+    '''
+    interpreter._load(program)
+    self.compiled = interpreter.compiled
+    self.function_starts = sorted((func_info.start_ip, name) for name, func_info in self.compiled.func_manager.func_cache.items())
+    counts = [0, 0, 0]  # values, scopes, string bytes
+
+    started = not tracemalloc.is_tracing()
+    if started:
+      tracemalloc.start()
+    uninstall = None
+    try:
+      uninstall = _install_counters(interpreter, counts)
+      self._run(interpreter, counts)
+    finally:
+      if uninstall is not None:
+        uninstall()
+      if started:
+        tracemalloc.stop()
+
+  def _run(self, interpreter, counts):
+    sites = self.sites
+    process_line = interpreter._process_line
+    get_traced_memory = tracemalloc.get_traced_memory
+    tracemalloc.reset_peak()
+    next_sample = self.statements + self.interval
+    while not interpreter.terminate:
+      line_num = interpreter.ip
+      values, scopes, string_bytes = counts
+      before = get_traced_memory()[0]
+      process_line()
+      allocated = get_traced_memory()[0] - before
+
+      site = sites.get(line_num)
+      if site is None:
+        site = sites[line_num] = [0, 0, 0, 0, 0]
+      site[0] += 1
+      site[1] += counts[0] - values
+      site[2] += counts[1] - scopes
+      site[3] += counts[2] - string_bytes
+      if allocated > 0:
+        site[4] += allocated
+
+      self.statements += 1
+      if self.statements >= next_sample:
+        self._sample(line_num, len(interpreter.return_stack))
+        next_sample = self.statements + self.interval
+    self._sample(interpreter.ip, len(interpreter.return_stack))
+
+  def _sample(self, line_num, depth):
+    current, peak = tracemalloc.get_traced_memory()
+    self.timeline.append((self.statements, current, peak, line_num, depth))
+    tracemalloc.reset_peak()
+
+  def function_of(self, line_num):
+    '''Returns the name of the function a line is in.'''
+    i = bisect.bisect_right(self.function_starts, (line_num, chr(0x10ffff))) - 1
+    return self.function_starts[i][1] if i >= 0 else '<none>'
+
+  def functions(self):
+    '''Returns {function: [statements, values, scopes, string bytes, allocated bytes]}.'''
+    totals = {}
+    for line_num, site in self.sites.items():
+      total = totals.setdefault(self.function_of(line_num), [0, 0, 0, 0, 0])
+      for i, count in enumerate(site):
+        total[i] += count
+    return totals
+
+  def peak(self):
+    '''Returns the highest sample of the timeline, or None before a run.'''
+    return max(self.timeline, key=lambda sample: sample[2], default=None)
+
+  def to_json(self):
+    fields = ('statements', 'values', 'scopes', 'string_bytes', 'allocated_bytes')
+    return json.dumps({
+      'statements': self.statements,
+      'functions': {name: dict(zip(fields, total)) for name, total in _ranked(self.functions())},
+      'lines': [dict(line=line_num + 1, function=self.function_of(line_num), **dict(zip(fields, site)))
+                for line_num, site in _ranked(self.sites)],
+      'timeline': [{'statements': statements, 'traced_bytes': current, 'peak_bytes': peak,
+                    'line': line_num + 1, 'depth': depth}
+                   for statements, current, peak, line_num, depth in self.timeline],
+    }, indent=2)
+
+  def to_text(self, limit=20):
+    '''Returns a report with functions and lines ranked by the bytes they allocated, and the timeline.'''
+    header = f'{"statements":>12} {"values":>10} {"scopes":>8} {"str bytes":>12} {"alloc bytes":>12}'
+    def row(site):
+      return f'{site[0]:>12} {site[1]:>10} {site[2]:>8} {site[3]:>12} {site[4]:>12}'
+
+    report = [f'{self.statements} statements']
+    peak = self.peak()
+    if peak is not None:
+      report.append(f'peak {peak[2]} bytes, in the sample taken after {peak[0]} statements (line {peak[3] + 1}, depth {peak[4]})')
+    report += ['', f'{"function":<20} {header}']
+    report += [f'{name:<20} {row(total)}' for name, total in _ranked(self.functions())[:limit]]
+    report += ['', f'{"line":<20} {header}']
+    report += [f'{f"{self.function_of(line_num)}:{line_num + 1}":<20} {row(site)}' for line_num, site in _ranked(self.sites)[:limit]]
+    report += ['', f'{"statements":>12} {"traced":>12} {"peak":>12} {"line":>6} {"depth":>6}']
+    report += [f'{statements:>12} {current:>12} {peak:>12} {line_num + 1:>6} {depth:>6}'
+               for statements, current, peak, line_num, depth in self.timeline]
+    return '\n'.join(report) + '\n'
+
+
+def _install_counters(interpreter, counts):
+  '''
+  Makes a loaded interpreter count the Values, scopes and string bytes it creates into counts, by
+  wrapping every interpreter method and operator table that creates them with instance attributes.
+  Returns the function removing the wrappers again.
+  '''
+  env_manager = interpreter.env_manager
+  installed = []  # (object, attribute) of every wrapper installed
+  binary_ops = interpreter.binary_ops
+
+  def created(value):
+    counts[0] += 1
+    if value.t is Type.STRING and value.v is not None:
+      counts[2] += _string_bytes(value.v)
+    return value
+
+  def install(owner, name, make_wrapper):
+    setattr(owner, name, make_wrapper(getattr(owner, name)))
+    installed.append((owner, name))
+
+  def uninstall():
+    for owner, name in installed:
+      delattr(owner, name)
+    interpreter.binary_ops = binary_ops
+
+  def counting_operation(operation):
+    return lambda a, b: created(operation(a, b))
+
+  def counting_get_value(get_value):
+    def counted(token):
+      value = get_value(token)
+      if token[0] == '"' or token.isdigit() or token[0] == '-' or token == InterpreterBase.TRUE_DEF \
+          or token == InterpreterBase.FALSE_DEF:
+        created(value)  # literals get a new Value every time
+      return value
+    return counted
+
+  def counting_eval_expression(eval_expression):
+    def counted(tokens):
+      value = eval_expression(tokens)
+      counts[0] += tokens.count('!')  # every ! makes a new bool
+      return value
+    return counted
+
+  def counting_find_first_instruction(find_first_instruction):
+    def counted(funcname, args=[]):
+      call_line = interpreter.ip
+      start_ip = find_first_instruction(funcname, args)
+      scope = env_manager.environment[-1]
+      for param_name, _, ref in interpreter.call_sites[call_line].params:
+        if not ref:
+          created(scope[param_name])  # by-value arguments are bound to a copy
+      return start_ip
+    return counted
+
+  def counting_endfunc(endfunc):
+    def counted(default_return=True):
+      return_type = env_manager.return_stack[-1]
+      endfunc(default_return)
+      if default_return and return_type in RESULT_TYPES:
+        counts[0] += 1  # the default return value
+    return counted
+
+  def counting_store_input(store_input):
+    def counted(result):
+      store_input(result)
+      counts[0] += 1
+      if result is not None:
+        counts[2] += _string_bytes(result)
+    return counted
+
+  def counting_strtoint(strtoint):
+    def counted(args):
+      strtoint(args)
+      counts[0] += 1
+    return counted
+
+  def counting_add(add):
+    def counted(symbol, value):
+      add(symbol, created(value))
+    return counted
+
+  def counting_set_return(set_return):
+    def counted(symbol, value):
+      set_return(symbol, value)
+      created(env_manager.results[symbol])  # registers hold a copy
+    return counted
+
+  def counting_push(push):
+    def counted():
+      counts[1] += 1
+      push()
+    return counted
+
+  try:
+    interpreter.binary_ops = {value_type: {op: counting_operation(operation) for op, operation in operations.items()}
+                              for value_type, operations in binary_ops.items()}
+    install(interpreter, '_get_value', counting_get_value)
+    install(interpreter, '_eval_expression', counting_eval_expression)
+    install(interpreter, '_find_first_instruction', counting_find_first_instruction)
+    install(interpreter, '_endfunc', counting_endfunc)
+    install(interpreter, '_store_input', counting_store_input)
+    install(interpreter, '_strtoint', counting_strtoint)
+    install(env_manager, 'add', counting_add)
+    install(env_manager, 'set_return', counting_set_return)
+    install(env_manager, 'push_scope', counting_push)
+    install(env_manager, 'push_frame', counting_push)
+  except BaseException:
+    uninstall()
+    raise
+  return uninstall
+
+
+def _ranked(counts):
+  '''Sorts {key: counts} by allocated bytes, then Values created, most first.'''
+  return sorted(counts.items(), key=lambda item: (item[1][4], item[1][1]), reverse=True)
+
+
+def _string_bytes(v):
+  if type(v) is StringBuilder:
+    v = v.parts[v.count - 1]  # only the newly appended piece is new
+  return len(v) if v.isascii() else len(v.encode())
+
+
+def main():
+  '''
+  Runs a program like test.py does and reports its memory use:
+    python memprof.py program.src [report.json] [--interval N]
+  Without a report file, the ranked report is printed to stderr.
+  '''
+  args = sys.argv[1:]
+  interval = 1000
+  if '--interval' in args:
+    i = args.index('--interval')
+    interval = int(args[i + 1])
+    del args[i:i + 2]
+  with open(args[0], 'r') as file:
+    lines = file.readlines()
+  profiler = MemoryProfiler(interval)
+  try:
+    profiler.run(Interpreter(), lines)
+  finally:
+    if profiler.compiled is not None:
+      _write_report(profiler, args[1] if len(args) > 1 else None)
+
+def _write_report(profiler, path):
+  if path is None:
+    print(profiler.to_text(), file=sys.stderr, end='')
+    return
+  with open(path, 'w') as file:
+    file.write(profiler.to_json())
+
+if __name__ == '__main__':
+  main()
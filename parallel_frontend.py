@@ -0,0 +1,142 @@
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from intbase import InterpreterBase
+from tokenizer import Keyword
+import frontend
+
+# Parallel front end for very large programs. The source is cut into chunks at lines starting a
+# function (`func`), where BlockAnalyzer starts afresh anyway, and the chunks are tokenized and
+# compiled by frontend._compile in a process pool. The results are merged back in source order,
+# so the Program is the same as frontend.compile_program's:
+# - each chunk's tokens are merged into one TokenStore, translating its symbol ids
+# - jumps are relative, so the per-line arrays just get concatenated
+# - the function table and the structure check are rebuilt here from the merged tokens, in line
+#   order: the workers have already raised any error they would raise, and sending their
+#   FuncInfos back would cost more than rebuilding them
+# - the first error raised by the chunks, in source order, is raised as the serial front end would
+#
+# Use it by compiling a program first and handing it to the interpreter, which reuses it:
+#
+#   interpreter.compiled = parallel_frontend.compile_program(lines)
+#   interpreter.run(lines)
+
+MIN_LINES = 20000     # smaller programs are compiled serially: starting the workers costs more
+CHUNKS_PER_WORKER = 4
+
+
+class _NoCheck:
+  '''Stands in for StructureCheck in the workers; the check is done once the chunks are merged.'''
+  def line(self, line_num, first_token, indent):
+    pass
+
+
+def compile_program(lines, reachable_only=False, processes=None, executor=None):
+  '''
+  Compiles a program like frontend.compile_program, spreading the work over a process pool:
+  executor if given, otherwise a pool of `processes` workers (the CPU count by default) created
+  for the call.
+  '''
+  if len(lines) < MIN_LINES:
+    return frontend.compile_program(lines, reachable_only)
+  if executor is None:
+    with ProcessPoolExecutor(processes) as executor:
+      return compile_program(lines, reachable_only, executor=executor)
+
+  dead = frontend._dead_lines(lines) if reachable_only else None
+  workers = processes or os.cpu_count()
+  program = _compile_parallel(lines, dead or None, executor, workers)
+  if dead:
+    # same rule as frontend.compile_program: unmatched reachable blocks need the whole program
+    ops, jumps = program.tokenized_program.ops, program.jumps
+    for line_num, op in enumerate(ops):
+      if (op == Keyword.IF or op == Keyword.ELSE or op == Keyword.WHILE
+          or op == Keyword.ENDWHILE) and not jumps[line_num]:
+        return _compile_parallel(lines, None, executor, workers)
+  return program
+
+
+def split(lines, chunks):
+  '''Returns the start lines of about `chunks` chunks of similar length, cut where functions start.'''
+  target = max(1, len(lines) // chunks)
+  starts = [0]
+  for line_num, line in enumerate(lines):
+    if line_num - starts[-1] >= target and _starts_function(line):
+      starts.append(line_num)
+  return starts
+
+
+def _starts_function(line):
+  if '"' in line:
+    return False  # be safe: quotes can change how the line tokenizes
+  tokens = line.split(InterpreterBase.COMMENT_DEF, 1)[0].split(None, 1)
+  return bool(tokens) and tokens[0] == InterpreterBase.FUNC_DEF
+
+
+def _compile_parallel(lines, dead, executor, workers):
+  starts = split(lines, workers * CHUNKS_PER_WORKER)
+  ends = starts[1:] + [len(lines)]
+  jobs = []
+  for start, end in zip(starts, ends):
+    chunk_dead = None
+    if dead is not None:
+      chunk_dead = {line_num - start for line_num in dead if start <= line_num < end}
+    jobs.append((start, lines[start:end], chunk_dead))
+
+  program = frontend.Program(lines)
+  program.jumps = array('i')
+  program.opens_scope = bytearray()
+  program.closes_scope = bytearray()
+  tokenized_program = program.tokenized_program
+  for chunk in executor.map(_compile_chunk, jobs):
+    tokenized_program.merge(chunk.tokenized_program)
+    program.indents.extend(chunk.indents)
+    program.jumps.extend(chunk.jumps)
+    program.opens_scope += chunk.opens_scope
+    program.closes_scope += chunk.closes_scope
+
+  # what frontend._compile does with each line's tokens, besides storing them
+  check = frontend.StructureCheck()
+  symbols, indents = tokenized_program.symbols, program.indents
+  for line_num, op in enumerate(tokenized_program.ops):
+    if op == Keyword.NONE:
+      continue
+    line = lines[line_num]
+    first_token = symbols[op] if '"' not in line else (line.split(InterpreterBase.COMMENT_DEF)[0].split() or [''])[0]
+    if first_token and dead is None:
+      check.line(line_num, first_token, indents[line_num])
+    if op == Keyword.FUNC:
+      program.func_manager.add_function(line_num, tokenized_program[line_num])
+  program.valid_structure = check.valid(len(lines)) if dead is None else None
+  return program
+
+
+def _compile_chunk(job):
+  start, lines, dead = job
+  chunk = frontend._compile(lines, dead, start, _NoCheck())
+  chunk.lines = chunk.func_manager = None  # the parent has the lines and rebuilds the functions
+  return chunk
+
+
+def main():
+  '''
+  Times the serial and parallel front ends on a program:
+    python parallel_frontend.py program.src [processes]
+  '''
+  import sys
+  import time
+  with open(sys.argv[1], 'r') as file:
+    lines = file.readlines()
+  processes = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+  start = time.perf_counter()
+  frontend.compile_program(lines)
+  serial = time.perf_counter() - start
+  with ProcessPoolExecutor(processes) as executor:
+    compile_program(lines[:MIN_LINES], executor=executor)  # start the workers
+    start = time.perf_counter()
+    compile_program(lines, executor=executor)
+    parallel = time.perf_counter() - start
+  print(f'{len(lines)} lines: serial {serial:.3f}s, {processes} processes {parallel:.3f}s')
+
+if __name__ == '__main__':
+  main()
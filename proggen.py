@@ -0,0 +1,89 @@
+import argparse
+import sys
+
+# Generates synthetic Brewin programs for scaling benchmarks (see scalebench.py). Each knob grows
+# one thing the interpreter has to cope with:
+# - functions: how many worker functions main calls
+# - depth: how deeply each worker's while loops nest; every level declares variables, so it's
+#   also the number of scopes a lookup of the worker's accumulator walks through
+# - trips: how many times each of those loops runs
+# - variables: how many variables each loop body declares and updates
+# - recursion: how deep a recursive function goes; it updates a variable of main's, which dynamic
+#   scoping finds by walking through every frame in between
+# - string_size: how many characters main appends to a string, one at a time
+#
+#   python proggen.py --functions 10 --depth 3 --trips 20 > program.src
+
+def generate(functions=1, depth=1, trips=10, variables=1, recursion=0, string_size=0):
+  '''Returns the program's lines.'''
+  lines = []
+  for func_num in range(functions):
+    lines += _worker(f'f{func_num}', depth, variables)
+  if recursion:
+    lines += [
+      'func rec n:int int',
+      '  if > n 0',
+      '    var int m',
+      '    assign m - n 1',
+      '    funccall rec m',
+      '    assign total + total 1',
+      '  endif',
+      '  return n',
+      'endfunc',
+      '',
+    ]
+
+  lines += ['func main void', '  var int total']
+  for func_num in range(functions):
+    lines += [f'  funccall f{func_num} {trips}', '  assign total + total resulti']
+  if recursion:
+    lines += [f'  funccall rec {recursion}']
+  if string_size:
+    lines += [
+      '  var string s',
+      '  var int k',
+      f'  while < k {string_size}',
+      '    assign s + s "x"',
+      '    assign k + k 1',
+      '  endwhile',
+      '  funccall print s',
+    ]
+  lines += ['  funccall print total', 'endfunc']
+  return [line + '\n' for line in lines]
+
+
+def _worker(name, depth, variables):
+  lines = [f'func {name} n:int int', '  var int acc']
+  for level in range(depth):
+    indent = '  ' * (level + 1)
+    lines += [f'{indent}var int c{level}', f'{indent}while < c{level} n']
+    if variables:
+      lines.append(f'{indent}  var int ' + ' '.join(f'v{level}_{i}' for i in range(variables)))
+      lines += [f'{indent}  assign v{level}_{i} + v{level}_{i} c{level}' for i in range(variables)]
+  indent = '  ' * (depth + 1)
+  if depth:
+    lines += [
+      f'{indent}if == % c{depth - 1} 2 0',
+      f'{indent}  assign acc + acc 1',
+      f'{indent}else',
+      f'{indent}  assign acc + acc 2',
+      f'{indent}endif',
+    ]
+  else:
+    lines.append(f'{indent}assign acc + acc n')
+  for level in reversed(range(depth)):
+    indent = '  ' * (level + 1)
+    lines += [f'{indent}  assign c{level} + c{level} 1', f'{indent}endwhile']
+  lines += ['  return acc', 'endfunc', '']
+  return lines
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Generate a synthetic Brewin program')
+  for knob, default in (('functions', 1), ('depth', 1), ('trips', 10), ('variables', 1), ('recursion', 0), ('string-size', 0)):
+    parser.add_argument(f'--{knob}', type=int, default=default)
+  args = parser.parse_args()
+  sys.stdout.writelines(generate(args.functions, args.depth, args.trips, args.variables, args.recursion, args.string_size))
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,43 @@
+import json
+import os
+import struct
+
+# Framing shared by daemon.py and client.py: every message, in either direction, is a 4-byte
+# big-endian length followed by that many bytes of UTF-8 JSON. This module only needs the
+# standard library, so the client starts without importing the interpreter.
+
+DEFAULT_SOCKET = os.environ.get('BREWIN_SOCKET', '/tmp/brewin.sock')
+HEADER = struct.Struct('>I')
+MAX_MESSAGE = 64 * 1024 * 1024
+
+
+def send_message(sock, message):
+  data = json.dumps(message).encode()
+  sock.sendall(HEADER.pack(len(data)) + data)
+
+
+def receive_message(sock):
+  '''Reads one message, or returns None if the connection was closed between messages.'''
+  header = _receive_exactly(sock, HEADER.size)
+  if header is None:
+    return None
+  (length,) = HEADER.unpack(header)
+  if length > MAX_MESSAGE:
+    raise ValueError(f'Message of {length} bytes is too large')
+  data = _receive_exactly(sock, length)
+  if data is None:
+    raise ConnectionError('Connection closed in the middle of a message')
+  return json.loads(data)
+
+
+def _receive_exactly(sock, size):
+  chunks = []
+  while size:
+    chunk = sock.recv(min(size, 1 << 20))
+    if not chunk:
+      if chunks:
+        raise ConnectionError('Connection closed in the middle of a message')
+      return None
+    chunks.append(chunk)
+    size -= len(chunk)
+  return b''.join(chunks)
@@ -0,0 +1,99 @@
+import math
+import sys
+import time
+import tracemalloc
+from interpreterv2 import Interpreter
+import frontend
+import proggen
+
+# Scaling benchmark: grows one knob of proggen.generate at a time and measures the front end,
+# the run time per statement executed and the peak memory of interpreterv2.Interpreter.
+#
+#   python scalebench.py [axis ...] [--quick]
+#
+# Time per statement stays flat while the interpreter scales linearly along an axis. If it
+# climbs, something costs more the larger the program gets, such as EnvironmentManager.get
+# walking more scopes or a block search scanning more lines. For every axis the table ends
+# with k in time ~ statements^k, fitted between the first and last points (or, where the points
+# run about as many statements, with how much the time per statement changed).
+
+BASE = dict(functions=1, depth=1, trips=2000, variables=1, recursion=0, string_size=0)
+INNER_ITERATIONS = 20000  # along depth, trips is picked to keep the innermost iterations about this
+
+AXES = {
+  'functions': [dict(functions=n, trips=20) for n in (50, 100, 200, 400)],
+  'depth': [dict(depth=d, trips=round(INNER_ITERATIONS ** (1 / d))) for d in (1, 2, 3, 4, 6)],
+  'trips': [dict(trips=n) for n in (2000, 4000, 8000, 16000)],
+  'variables': [dict(variables=n) for n in (1, 4, 16, 64)],
+  'recursion': [dict(functions=0, recursion=n) for n in (250, 500, 1000, 2000)],
+  'string_size': [dict(functions=0, string_size=n) for n in (10000, 20000, 40000, 80000)],
+}
+
+
+def measure(lines, repeat=3):
+  '''
+  Returns (front end seconds, statements, best run seconds, peak traced bytes) for a program.
+  The statement count and memory come from a separate run, so they don't slow the timed ones.
+  '''
+  start = time.perf_counter()
+  frontend.compile_program(lines)
+  compile_time = time.perf_counter() - start
+
+  run_time = math.inf
+  for _ in range(repeat):
+    interpreter = Interpreter(console_output=False)
+    start = time.perf_counter()
+    interpreter.run(lines)
+    run_time = min(run_time, time.perf_counter() - start)
+
+  statements = [0]
+  def count(interpreter, line_num):
+    statements[0] += 1
+  interpreter = Interpreter(console_output=False)
+  interpreter.add_hook('statement', count)
+  started = not tracemalloc.is_tracing()
+  if started:
+    tracemalloc.start()
+  tracemalloc.reset_peak()
+  try:
+    interpreter.run(lines)
+    peak = tracemalloc.get_traced_memory()[1]
+  finally:
+    if started:
+      tracemalloc.stop()
+  return compile_time, statements[0], run_time, peak
+
+
+def run_axis(axis, points, repeat=3, out=sys.stdout):
+  print(f'\n{axis}', file=out)
+  print(f'{"value":>8} {"lines":>8} {"compile ms":>11} {"statements":>11} {"run s":>8} {"ns/stmt":>8} {"peak KiB":>9}', file=out)
+  results = []
+  for point in points:
+    params = dict(BASE, **point)
+    lines = proggen.generate(**params)
+    compile_time, statements, run_time, peak = measure(lines, repeat)
+    results.append((statements, run_time))
+    print(f'{params[axis]:>8} {len(lines):>8} {compile_time * 1000:>11.1f} {statements:>11} {run_time:>8.3f} '
+          f'{run_time / statements * 1e9:>8.0f} {peak / 1024:>9.0f}', file=out)
+  (first_statements, first_time), (last_statements, last_time) = results[0], results[-1]
+  if last_statements > 1.5 * first_statements:
+    k = math.log(last_time / first_time) / math.log(last_statements / first_statements)
+    print(f'time ~ statements^{k:.2f}', file=out)
+  else:  # about the same work at every point, so compare the time per statement
+    change = (last_time / last_statements) / (first_time / first_statements)
+    print(f'time per statement x{change:.2f}', file=out)
+  return results
+
+
+def main():
+  args = sys.argv[1:]
+  quick = '--quick' in args
+  axes = [arg for arg in args if arg != '--quick'] or list(AXES)
+  for axis in axes:
+    if axis not in AXES:
+      sys.exit(f'Unknown axis {axis}, expected one of {", ".join(AXES)}')
+    points = AXES[axis][:2] if quick else AXES[axis]
+    run_axis(axis, points, repeat=1 if quick else 3)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,101 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Startup benchmark: how long importing the interpreter takes (python -X importtime) and how long
+# a hello world program takes end to end through brewin.py and test.py. Every run appends its
+# results as a line of JSON to bench_output.txt and prints them next to the previous run's, so
+# startup can be tracked over time:
+#
+#   python startbench.py [--runs N]
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+OUTPUT = os.path.join(HERE, 'bench_output.txt')
+HELLO = 'func main void\n  funccall print "hello world"\nendfunc\n'
+
+
+def _environment():
+  environment = dict(os.environ)
+  environment.pop('PYTHONDONTWRITEBYTECODE', None)  # time imports from cached bytecode, as users see them
+  return environment
+
+
+def import_times(runs):
+  '''Returns {module: best cumulative import time in microseconds} for importing interpreterv2.'''
+  best = {}
+  for _ in range(runs):
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import interpreterv2'],
+                            cwd=HERE, env=_environment(), capture_output=True, text=True, check=True)
+    for line in result.stderr.splitlines():
+      if not line.startswith('import time:') or 'cumulative' in line:
+        continue
+      _, cumulative, name = line[len('import time:'):].split('|')
+      name = name.strip()
+      best[name] = min(best.get(name, float('inf')), int(cumulative))
+  return best
+
+
+def latency(command, runs):
+  '''Returns the median wall time of a command in milliseconds.'''
+  times = []
+  for _ in range(runs):
+    start = time.perf_counter()
+    subprocess.run(command, cwd=HERE, env=_environment(), stdout=subprocess.DEVNULL, check=True)
+    times.append((time.perf_counter() - start) * 1000)
+  return statistics.median(times)
+
+
+def _commit():
+  try:
+    return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, capture_output=True, text=True).stdout.strip()
+  except OSError:
+    return None
+
+
+def benchmark(runs=20):
+  hello_path = os.path.join(HERE, 'bench_hello.src')
+  with open(hello_path, 'w') as file:
+    file.write(HELLO)
+  try:
+    latency([sys.executable, 'brewin.py', hello_path], 1)  # warm the bytecode cache
+    imports = import_times(runs)
+    return {
+      'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+      'commit': _commit(),
+      'python': sys.version.split()[0],
+      'import_us': imports.get('interpreterv2'),
+      'slowest_imports_us': dict(sorted(imports.items(), key=lambda item: -item[1])[1:9]),
+      'python_ms': latency([sys.executable, '-c', 'pass'], runs),
+      'brewin_ms': latency([sys.executable, 'brewin.py', hello_path], runs),
+      'test_ms': latency([sys.executable, 'test.py', hello_path], runs),
+    }
+  finally:
+    os.remove(hello_path)
+
+
+def _previous():
+  if not os.path.exists(OUTPUT):
+    return None
+  with open(OUTPUT, 'r') as file:
+    lines = [line for line in file if line.startswith('{')]
+  return json.loads(lines[-1]) if lines else None
+
+
+def main():
+  runs = int(sys.argv[sys.argv.index('--runs') + 1]) if '--runs' in sys.argv else 20
+  previous = _previous()
+  results = benchmark(runs)
+  for key, unit in (('import_us', 'us'), ('python_ms', 'ms'), ('brewin_ms', 'ms'), ('test_ms', 'ms')):
+    line = f'{key:<12} {results[key]:>10.1f} {unit}'
+    if previous is not None and previous.get(key):
+      line += f'   was {previous[key]:.1f} at {previous["commit"]} ({results[key] / previous[key] - 1:+.0%})'
+    print(line)
+  print('slowest imports:', ', '.join(f'{name} {us}us' for name, us in results['slowest_imports_us'].items()))
+  with open(OUTPUT, 'a') as file:
+    file.write(json.dumps(results) + '\n')
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,284 @@
+import hashlib
+import json
+import operator
+import threading
+from intbase import InterpreterBase
+from value import Type
+from tokenizer import Keyword
+
+# Profile-guided superinstructions. The first run of a program with Interpreter(superinstructions=True)
+# counts how often each statement is followed by each other statement. Later runs of the same program
+# take the hottest of those pairs and run both statements from a single handler, with the statements
+# specialized to the shape they have in the program:
+# - assign x <op> a b (int arithmetic or comparison on int variables/literals), assign x y
+# - if/while comparing two ints
+# - endwhile
+# so they skip _process_line's dispatch and _eval_expression's generic stack machine.
+#
+# A specialized statement checks everything the generic path would (types, existing variables,
+# division by zero, ...) and hands the statement to _process_line as soon as anything is unusual,
+# so errors are reported exactly as before.
+
+MIN_COUNT = 64  # times a pair must have run in the profiling run to get a superinstruction
+
+INT_OPERATORS = {
+  '+': (operator.add, Type.INT),
+  '-': (operator.sub, Type.INT),
+  '*': (operator.mul, Type.INT),
+  '/': (operator.floordiv, Type.INT),
+  '%': (operator.mod, Type.INT),
+  '==': (operator.eq, Type.BOOL),
+  '!=': (operator.ne, Type.BOOL),
+  '<': (operator.lt, Type.BOOL),
+  '<=': (operator.le, Type.BOOL),
+  '>': (operator.gt, Type.BOOL),
+  '>=': (operator.ge, Type.BOOL),
+}
+
+PROFILES_SIZE = 64  # programs whose Profile is kept, evicting the least recently used
+profiles = {}  # program hash -> Profile of its first run
+_profiles_lock = threading.Lock()
+
+
+class Profile:
+  '''
+  How many times each pair of statements ran back to back: (line, next line) -> count.
+  '''
+  def __init__(self, pairs=None):
+    self.pairs = pairs if pairs is not None else {}
+
+  def hot_pairs(self, min_count=None):
+    '''
+    Returns {line: next line} for the most frequent successor of every line, if it ran at least
+    min_count times (MIN_COUNT by default).
+    '''
+    if min_count is None:
+      min_count = MIN_COUNT
+    best = {}
+    for (line_num, next_line), count in self.pairs.items():
+      if count >= min_count and count > best.get(line_num, (None, 0))[1]:
+        best[line_num] = (next_line, count)
+    return {line_num: next_line for line_num, (next_line, _) in best.items()}
+
+  def to_json(self):
+    return json.dumps([[a, b, count] for (a, b), count in self.pairs.items()])
+
+  @classmethod
+  def from_json(cls, text):
+    return cls({(a, b): count for a, b, count in json.loads(text)})
+
+
+def program_hash(program):
+  return hashlib.sha256(json.dumps(program).encode()).hexdigest()
+
+
+def run(interpreter, program):
+  '''
+  Runs a program, profiling it if it hasn't been profiled yet and using superinstructions otherwise.
+  '''
+  key = program_hash(program)
+  interpreter._load(program)
+  with _profiles_lock:
+    profile = profiles.get(key)
+    if profile is not None:
+      profiles[key] = profiles.pop(key)
+  if profile is None:
+    profile = Profile()
+    try:
+      _profile(interpreter, profile.pairs)
+    finally:
+      # only published once complete, so other threads never read pairs while they change
+      with _profiles_lock:
+        profiles[key] = profile
+        while len(profiles) > PROFILES_SIZE:
+          del profiles[next(iter(profiles))]
+    return
+
+  handlers = build(interpreter, profile)
+  size = len(handlers)
+  process_line = interpreter._process_line
+  while not interpreter.terminate:
+    ip = interpreter.ip
+    handler = handlers[ip] if ip < size else None  # running off the end is _process_line's error to report
+    if handler is None:
+      process_line()
+    else:
+      handler()
+
+
+def _profile(interpreter, pairs):
+  process_line = interpreter._process_line
+  while not interpreter.terminate:
+    line_num = interpreter.ip
+    process_line()
+    key = (line_num, interpreter.ip)
+    pairs[key] = pairs.get(key, 0) + 1
+
+
+def build(interpreter, profile):
+  '''
+  Returns the handler to run for every line of the loaded program: a superinstruction for the
+  first line of every hot pair that has a specialized statement, and None everywhere else.
+  '''
+  handlers = [None] * len(interpreter.program)
+  for line_num, next_line in profile.hot_pairs().items():
+    if not (0 <= line_num < len(handlers) and 0 <= next_line < len(handlers)):
+      continue
+    first = _specialize(interpreter, line_num)
+    second = _specialize(interpreter, next_line)
+    if first is None and second is None:
+      continue
+    handlers[line_num] = _fuse(interpreter, first or interpreter._process_line, second or interpreter._process_line, next_line)
+  return handlers
+
+
+def _fuse(interpreter, first, second, next_line):
+  def superinstruction():
+    first()
+    if interpreter.ip == next_line and not interpreter.terminate:
+      second()
+  return superinstruction
+
+
+def _specialize(interpreter, line_num):
+  '''
+  Returns a function running the statement on line_num, specialized to its shape, or None if
+  there's no specialized version of it.
+  '''
+  op = interpreter.ops[line_num]
+  args = interpreter.tokenized_program.args(line_num)
+  if op == Keyword.ASSIGN and len(args) == 4 and args[1] in INT_OPERATORS:
+    return _binary_assign(interpreter, args[0], args[1], args[3], args[2])
+  if op == Keyword.ASSIGN and len(args) == 2:
+    return _copy_assign(interpreter, args[0], args[1])
+  if (op == Keyword.IF or op == Keyword.WHILE) and len(args) == 3 and args[0] in INT_OPERATORS \
+      and INT_OPERATORS[args[0]][1] == Type.BOOL and interpreter.jumps[line_num]:
+    condition = _int_operation(interpreter, args[0], args[2], args[1])
+    if condition is not None:
+      return (_if if op == Keyword.IF else _while)(interpreter, line_num, condition)
+  if op == Keyword.ENDWHILE and interpreter.jumps[line_num]:
+    return _endwhile(interpreter, line_num)
+  return None
+
+
+def _operand(interpreter, token):
+  '''
+  Returns a function giving the Value of an operand like Interpreter._get_value does (None if it
+  doesn't exist), or None if the token isn't a variable or an int literal.
+  '''
+  if not token or token[0] == '"' or token == InterpreterBase.TRUE_DEF or token == InterpreterBase.FALSE_DEF \
+      or token in interpreter.binary_op_list or token == '!':
+    return None
+  if token.isdigit() or token[0] == '-':
+    try:
+      constant = interpreter._get_value(token)
+    except Exception:
+      return None
+    return lambda: constant
+  def variable():
+    return interpreter.env_manager.lookup(token)
+  return variable
+
+
+def _int_operation(interpreter, op, right, left):
+  '''
+  Returns a function computing `op left right` on two ints, or returning None where the generic
+  path has to run instead. right is evaluated first, as _eval_expression does.
+  '''
+  get_right, get_left = _operand(interpreter, right), _operand(interpreter, left)
+  if get_right is None or get_left is None:
+    return None
+  function = INT_OPERATORS[op][0]
+  divides = op == '/' or op == '%'
+  INT = Type.INT
+  def operation():
+    b = get_right()
+    a = get_left()
+    if a is None or b is None or a.t is not INT or b.t is not INT or (divides and b.v == 0):
+      return None
+    return function(a.v, b.v)
+  return operation
+
+
+def _binary_assign(interpreter, var_name, op, right, left):
+  operation = _int_operation(interpreter, op, right, left)
+  if operation is None:
+    return None
+  result_type = INT_OPERATORS[op][1]
+  process_line = interpreter._process_line
+  def assign():
+    env_manager = interpreter.env_manager
+    result = operation()
+    if result is None or var_name in env_manager.results:
+      return process_line()
+    target = env_manager.get(var_name)
+    if target is None or target.t is not result_type:
+      return process_line()
+    target.v = result
+    interpreter.ip += 1
+  return assign
+
+
+def _copy_assign(interpreter, var_name, source):
+  get_value = _operand(interpreter, source)
+  if get_value is None:
+    return None
+  process_line = interpreter._process_line
+  def assign():
+    env_manager = interpreter.env_manager
+    value = get_value()
+    if value is None or var_name in env_manager.results:
+      return process_line()
+    target = env_manager.get(var_name)
+    if target is None or target.t is not value.t:
+      return process_line()
+    target.v = value.v
+    interpreter.ip += 1
+  return assign
+
+
+def _if(interpreter, line_num, condition):
+  jump = line_num + interpreter.jumps[line_num]
+  opens_scope = interpreter.opens_scope[line_num]
+  else_scope = interpreter.ops[jump] == Keyword.ELSE and interpreter.opens_scope[jump]
+  process_line = interpreter._process_line
+  def if_statement():
+    value = condition()
+    if value is None:
+      return process_line()
+    if value:
+      if opens_scope:
+        interpreter.env_manager.push_scope()
+      interpreter.ip = line_num + 1
+    else:
+      if else_scope:
+        interpreter.env_manager.push_scope()
+      interpreter.ip = jump + 1
+  return if_statement
+
+
+def _while(interpreter, line_num, condition):
+  end = line_num + interpreter.jumps[line_num]
+  opens_scope = interpreter.opens_scope[line_num]
+  process_line = interpreter._process_line
+  def while_statement():
+    value = condition()
+    if value is None:
+      return process_line()
+    if value:
+      if opens_scope:
+        interpreter.env_manager.push_scope()
+      interpreter.ip = line_num + 1
+    else:
+      interpreter.ip = end + 1
+  return while_statement
+
+
+def _endwhile(interpreter, line_num):
+  start = line_num + interpreter.jumps[line_num]
+  closes_scope = interpreter.closes_scope[line_num]
+  def endwhile():
+    if closes_scope:
+      interpreter.env_manager.pop_scope()
+    interpreter.ip = start
+  return endwhile
@@ -0,0 +1,38 @@
+import os
+import sys
+
+# Shared by the pytest suite. The .src files in this directory are the sample programs every
+# execution mode is compared with the plain interpreter on.
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TESTS_DIR))
+
+from interpreterv2 import Interpreter
+
+SAMPLES = sorted(name for name in os.listdir(TESTS_DIR) if name.endswith('.src'))
+INPUT = ['7', '3', 'bob', '12']  # enough for every sample that reads input
+
+
+def load(name):
+  '''Returns the lines of a sample program.'''
+  with open(os.path.join(TESTS_DIR, name), 'r') as file:
+    return file.readlines()
+
+
+def lines(text):
+  '''Returns the lines of a program written inline in a test.'''
+  return text.splitlines(True)
+
+
+def finish(interpreter, program):
+  '''Runs a program on an interpreter, returning what it printed and its (error type, error line).'''
+  try:
+    interpreter.run(program)
+  except Exception:
+    pass
+  return interpreter.get_output(), interpreter.get_error_type_and_line()
+
+
+def run(program, input=None, **options):
+  '''Runs a program on a fresh Interpreter built with options, like finish.'''
+  return finish(Interpreter(console_output=False, input=list(INPUT if input is None else input), **options), program)
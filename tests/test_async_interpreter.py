@@ -0,0 +1,64 @@
+import asyncio
+import threading
+import pytest
+from helpers import SAMPLES, INPUT, load, lines, run
+from async_interpreter import AsyncInterpreter
+
+
+def finish_async(interpreter, program):
+  try:
+    asyncio.run(interpreter.run(program))
+  except Exception:
+    pass
+  return interpreter.get_output(), interpreter.get_error_type_and_line()
+
+
+@pytest.mark.parametrize('name', SAMPLES)
+def test_matches_the_interpreter(name):
+  interpreter = AsyncInterpreter(console_output=False, input=list(INPUT), yield_every=3)
+  assert finish_async(interpreter, load(name)) == run(load(name))
+
+
+def test_sessions_share_the_event_loop():
+  echo = lines('func main void\n  funccall input "name?"\n  funccall print "hi " results\nendfunc\n')
+  count = lines('func main void\n  var int i\n  while < i 50\n    assign i + i 1\n  endwhile\n  funccall print i\nendfunc\n')
+  order = []
+
+  async def main():
+    name = asyncio.Event()
+    async def provider():
+      await name.wait()
+      return 'bob'
+    waiting = AsyncInterpreter(console_output=False, input_provider=provider)
+    counting = AsyncInterpreter(console_output=False, yield_every=10)
+    async def session(interpreter, program):
+      await interpreter.run(program)
+      order.append(interpreter.get_output())
+    task = asyncio.create_task(session(waiting, echo))
+    await session(counting, count)  # runs to the end while the other session waits for input
+    name.set()
+    await task
+
+  asyncio.run(main())
+  assert order == [['50'], ['name?', 'hi bob']]
+
+
+def test_keyboard_input_doesnt_block_the_event_loop(monkeypatch):
+  echo = lines('func main void\n  funccall input "name?"\n  funccall print "hi " results\nendfunc\n')
+  count = lines('func main void\n  var int i\n  while < i 50\n    assign i + i 1\n  endwhile\n  funccall print i\nendfunc\n')
+  typed = threading.Event()
+  monkeypatch.setattr('builtins.input', lambda: 'bob' if typed.wait(10) else 'timed out')
+  order = []
+
+  async def main():
+    async def session(interpreter, program):
+      await interpreter.run(program)
+      order.append(interpreter.get_output())
+    task = asyncio.create_task(session(AsyncInterpreter(console_output=False), echo))
+    await asyncio.sleep(0)  # the echo session is now waiting for the keyboard
+    await session(AsyncInterpreter(console_output=False, yield_every=10), count)
+    typed.set()
+    await task
+
+  asyncio.run(main())
+  assert order == [['50'], ['name?', 'hi bob']]
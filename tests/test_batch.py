@@ -0,0 +1,22 @@
+import pytest
+from helpers import SAMPLES, load, run
+
+pytest.importorskip('numpy')
+from batch import BatchInterpreter
+
+INPUTS = [['7', '3', 'bob', '12'], ['27', '0', 'x'], ['1', 'x'], ['5', '4', '', '9'], ['12'], []]
+
+
+@pytest.mark.parametrize('name', SAMPLES)
+def test_lanes_match_the_interpreter(name):
+  program = load(name)
+  results = BatchInterpreter().run(program, INPUTS * 3)
+  for input, result in zip(INPUTS * 3, results):
+    assert (result.output, (result.error_type, result.error_line)) == run(program, input)
+
+
+def test_lanes_run_in_the_batch():
+  results = BatchInterpreter().run(load('collatz.src'), [[str(n), str(n)] for n in range(1, 40)])
+  assert sum(result.scalar for result in results) < 5  # only lanes looping long after the rest
+  assert results[26].output[1] == '27 -> 111 large'
+  assert not any(result.scalar for result in BatchInterpreter().run(load('fib.src'), [[]] * 20))
@@ -0,0 +1,96 @@
+import os
+import pytest
+from helpers import SAMPLES, INPUT, load, lines, run
+from interpreterv2 import Interpreter
+import checkpoint
+
+ASK = lines('''func main void
+  var int i
+  while < i 5
+    assign i + i 1
+  endwhile
+  funccall input
+  funccall print i " " results
+endfunc
+''')
+
+
+class Interrupted(Exception):
+  pass
+
+
+class InterruptedInterpreter(Interpreter):
+  '''Stops with a non-Brewin exception when the program asks for input, like a killed job.'''
+  def get_input(self):
+    raise Interrupted()
+
+
+def resumed(program, statements):
+  '''
+  What a program prints when snapshotted after some statements and resumed in a new interpreter,
+  or None if it stopped with an error before that.
+  '''
+  interpreter = Interpreter(console_output=False, input=list(INPUT))
+  try:
+    interpreter._load(program)
+    for _ in range(statements):
+      if interpreter.terminate:
+        break
+      interpreter._process_line()
+  except Exception:
+    return None
+  data = checkpoint.snapshot(interpreter, statements)
+  resumed = Interpreter(console_output=False, input=list(INPUT))
+  try:
+    checkpoint.restore(resumed, program, data)
+    while not resumed.terminate:
+      resumed._process_line()
+  except Exception:
+    pass
+  return resumed.get_output(), resumed.get_error_type_and_line()
+
+
+@pytest.mark.parametrize('name', SAMPLES)
+def test_resumed_runs_match_the_interpreter(name):
+  program = load(name)
+  expected = run(program)
+  for statements in (1, 5, 17, 60, 1000):
+    result = resumed(program, statements)
+    if result is None:
+      assert expected[1][0] is not None
+      break
+    assert result == expected
+
+
+def test_snapshot_removed_when_finished(tmp_path):
+  path = str(tmp_path / 'run.ckpt')
+  interpreter = Interpreter(console_output=False, input=['x'])
+  checkpoint.run(interpreter, ASK, path, every=2)
+  assert interpreter.get_output() == ['5 x']
+  assert not os.path.exists(path)
+
+
+def test_snapshot_removed_after_brewin_error(tmp_path):
+  path = str(tmp_path / 'run.ckpt')
+  program = ASK[:-2] + ['  assign i "x"\n'] + ASK[-2:]
+  with pytest.raises(Exception):
+    checkpoint.run(Interpreter(console_output=False, input=['x']), program, path, every=2)
+  assert not os.path.exists(path)
+
+
+def test_snapshot_kept_after_other_exceptions(tmp_path):
+  path = str(tmp_path / 'run.ckpt')
+  with pytest.raises(Interrupted):
+    checkpoint.run(InterruptedInterpreter(console_output=False), ASK, path, every=2)
+  assert os.path.exists(path)
+  interpreter = Interpreter(console_output=False, input=['x'])
+  checkpoint.run(interpreter, ASK, path, every=2)
+  assert interpreter.get_output() == ['5 x']
+
+
+def test_snapshot_of_another_program_is_refused():
+  interpreter = Interpreter(console_output=False)
+  interpreter._load(ASK)
+  data = checkpoint.snapshot(interpreter)
+  with pytest.raises(checkpoint.CheckpointError):
+    checkpoint.restore(Interpreter(console_output=False), load('fib.src'), data)
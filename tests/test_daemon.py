@@ -0,0 +1,77 @@
+import os
+import socket
+import tempfile
+import threading
+import pytest
+from helpers import SAMPLES, INPUT, load, lines, run
+from protocol import send_message, receive_message
+from daemon import Daemon
+
+
+@pytest.fixture(scope='module')
+def daemon():
+  path = os.path.join(tempfile.mkdtemp(), 'brewin.sock')
+  server = Daemon(path)
+  thread = threading.Thread(target=server.serve_forever, daemon=True)
+  thread.start()
+  yield server
+  server.shutdown()
+  server.server_close()
+
+
+def request(daemon, **request):
+  with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+    sock.settimeout(10)  # a run blocked on the daemon's stdin fails instead of hanging
+    sock.connect(daemon.path)
+    send_message(sock, request)
+    return receive_message(sock)
+
+
+@pytest.mark.parametrize('name', SAMPLES)
+def test_matches_the_interpreter(daemon, name):
+  response = request(daemon, source=load(name), input=INPUT)
+  output, (error_type, error_line) = run(load(name))
+  assert response['output'] == output
+  assert response['error_type'] == (error_type.name if error_type else None)
+  assert response['error_line'] == error_line
+
+
+def test_input_without_input_lines_doesnt_read_stdin(daemon):
+  program = lines('func main void\n  funccall input "name?"\n  funccall print "got " results\nendfunc\n')
+  response = request(daemon, source=program)
+  assert response['output'] == ['name?', 'got None']
+  assert response['exception'] is None
+
+
+def test_programs_run_again_by_id(daemon):
+  program = load('fib.src')
+  first = request(daemon, source=program)
+  again = request(daemon, program=first['program'])
+  assert again == first
+  assert 'error' in request(daemon, program='unknown')
+
+
+def test_limits(daemon):
+  program = lines('func main void\n  while True\n    funccall print "x"\n  endwhile\nendfunc\n')
+  assert request(daemon, source=program, max_output=3)['exception'] == 'LimitExceeded: Program exceeded 3 lines of output'
+  response = request(daemon, source=program, max_steps=10)
+  assert response['exception'] == 'LimitExceeded: Program exceeded 10 steps'
+
+
+def test_only_stale_sockets_are_replaced(daemon, tmp_path):
+  regular = tmp_path / 'notes.txt'
+  regular.write_text('keep me')
+  with pytest.raises(FileExistsError):
+    Daemon(str(regular))
+  assert regular.read_text() == 'keep me'
+
+  with pytest.raises(FileExistsError):
+    Daemon(daemon.path)  # still serving
+  assert request(daemon, source=lines('func main void\n  funccall print 1\nendfunc\n'))['output'] == ['1']
+
+  stale = str(tmp_path / 'stale.sock')
+  with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+    sock.bind(stale)  # bound but never listening, like a daemon that died
+  server = Daemon(stale)
+  server.server_close()
+  assert not os.path.exists(stale)
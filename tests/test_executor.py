@@ -0,0 +1,44 @@
+import queue
+import pytest
+from helpers import SAMPLES, INPUT, load, lines, run
+from executor import ProgramExecutor
+
+ECHO = lines('func main void\n  funccall input\n  funccall print "got " results\nendfunc\n')
+
+
+def outcome(result):
+  return result.output, (result.error_type, result.error_line)
+
+
+@pytest.mark.parametrize('options', [{}, {'jit': True}, {'superinstructions': True}])
+def test_concurrent_runs_match_the_interpreter(options):
+  programs = [load(name) for name in SAMPLES]
+  expected = [run(program) for program in programs]
+  with ProgramExecutor(max_workers=4, **options) as executor:
+    compiled = [executor.compile(program) for program in programs]
+    futures = [executor.submit(program, list(INPUT)) for _ in range(5) for program in compiled]
+    assert [outcome(future.result()) for future in futures] == expected * 5
+
+
+def test_map_over_inputs():
+  with ProgramExecutor(max_workers=3) as executor:
+    results = list(executor.map(ECHO, [['a'], ['b'], [], None]))
+  # without input there's no keyboard to read from, so input gives None
+  assert [result.output for result in results] == [['got a'], ['got b'], ['got None'], ['got None']]
+
+
+def test_input_is_read_when_the_program_asks():
+  pending = queue.Queue()
+  with ProgramExecutor(max_workers=2) as executor:
+    future = executor.submit(ECHO, iter(pending.get, None))
+    other = executor.submit(ECHO, ['b'])  # runs while the first one waits for input
+    assert other.result(timeout=10).output == ['got b']
+    assert not future.done()
+    pending.put('a')
+    assert future.result(timeout=10).output == ['got a']
+
+
+def test_errors_are_reported_per_run():
+  with ProgramExecutor() as executor:
+    result = executor.submit(lines('func main void\n  funccall print x\nendfunc\n')).result()
+  assert result.error_line == 1 and result.exception is not None
@@ -0,0 +1,81 @@
+import pytest
+from helpers import SAMPLES, INPUT, load, lines, run, finish
+from intbase import InterpreterBase
+from interpreterv2 import Interpreter
+from tokenizer import Tokenizer
+import frontend
+
+
+def edits(program):
+  '''The program with each line in turn deleted, indented one more space, or unindented.'''
+  for line_num, line in enumerate(program):
+    yield program[:line_num] + program[line_num + 1:]
+    yield program[:line_num] + [' ' + line] + program[line_num + 1:]
+    yield program[:line_num] + [line.lstrip(' ')] + program[line_num + 1:]
+
+
+def base_valid(program):
+  try:
+    InterpreterBase.validate_program(Interpreter(console_output=False), program)
+  except Exception:
+    return False
+  return True
+
+
+@pytest.mark.parametrize('name', SAMPLES)
+def test_structure_check_agrees_with_interpreter_base(name):
+  for program in [load(name)] + list(edits(load(name))):
+    try:
+      compiled = frontend.compile_program(program)
+    except Exception:
+      continue  # tokenizer errors are reported when the program runs
+    assert bool(compiled.valid_structure) == base_valid(program)
+
+
+@pytest.mark.parametrize('name', SAMPLES)
+def test_tokens_and_indents(name):
+  program = load(name)
+  compiled = frontend.compile_program(program)
+  for line_num, line in enumerate(program):
+    assert list(compiled.tokenized_program[line_num]) == Tokenizer._tokenize(line_num, line.rstrip())
+    assert compiled.indents[line_num] == len(line) - len(line.lstrip(' '))
+
+
+def test_validate_program_reports_like_interpreter_base():
+  program = load('fib.src')
+  broken = program[:3] + program[4:]  # drop an endif
+  with pytest.raises(Exception) as base_error:
+    InterpreterBase.validate_program(Interpreter(console_output=False), broken)
+  with pytest.raises(Exception) as error:
+    Interpreter(console_output=False).validate_program(broken)
+  assert str(error.value) == str(base_error.value)
+  Interpreter(console_output=False).validate_program(program)
+
+
+def test_unreachable_functions_are_left_blank():
+  program = lines('''func unused void
+  funccall helper
+endfunc
+func helper void
+  funccall print "helper"
+endfunc
+func used void
+  funccall print "used"
+endfunc
+func main void
+  funccall used
+endfunc
+''')
+  compiled = frontend.compile_program(program, reachable_only=True)
+  assert frontend._dead_lines(program) == {1, 2, 4, 5}
+  assert [line_num for line_num in range(len(program)) if not compiled.tokenized_program[line_num]] == [1, 2, 4, 5]
+  assert compiled.valid_structure is None
+  assert run(program) == (['used'], (None, None))
+
+
+@pytest.mark.parametrize('name', SAMPLES)
+def test_reachable_only_runs_like_a_full_compile(name):
+  program = load(name)
+  interpreter = Interpreter(console_output=False, input=list(INPUT))
+  interpreter.compiled = frontend.compile_program(program)
+  assert finish(interpreter, program) == run(program)
@@ -0,0 +1,36 @@
+import pytest
+from helpers import SAMPLES, INPUT, load, lines, run
+from intbase import ErrorType
+from grading import GradingInterpreter
+
+COUNT = lines('func main void\n  var int i\n  while < i 3\n    funccall print i\n    assign i + i 1\n  endwhile\nendfunc\n')
+
+
+@pytest.mark.parametrize('jit', [False, True])
+@pytest.mark.parametrize('name', SAMPLES)
+def test_interpreter_output_passes(name, jit):
+  output, error = run(load(name))
+  interpreter = GradingInterpreter(output, error if error[0] else None, list(INPUT), jit)
+  assert interpreter.grade(load(name)).passed
+  assert interpreter.get_output() == output
+
+
+def test_stops_at_first_different_line():
+  interpreter = GradingInterpreter(['0', '7', '2'])
+  result = interpreter.grade(COUNT)
+  assert (result.passed, result.reason, result.line, result.expected, result.actual) == (False, 'output', 1, '7', '1')
+  assert interpreter.get_output() == ['0']
+  assert interpreter.lines_checked == 1
+  assert interpreter.mismatch is result
+
+
+def test_extra_and_missing_output():
+  assert GradingInterpreter(['0', '1']).grade(COUNT).reason == 'extra output'
+  result = GradingInterpreter(['0', '1', '2', '3\n']).grade(COUNT)
+  assert (result.reason, result.line, result.expected) == ('missing output', 3, '3')
+
+
+def test_expected_error():
+  program = lines('func main void\n  funccall print "a"\n  funccall print x\nendfunc\n')
+  assert GradingInterpreter(['a'], (ErrorType.NAME_ERROR, 2)).grade(program).passed
+  assert GradingInterpreter(['a']).grade(program).reason == 'error'
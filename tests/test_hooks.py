@@ -0,0 +1,89 @@
+import pytest
+from helpers import SAMPLES, INPUT, load, lines, run, finish
+from interpreterv2 import Interpreter
+from intbase import ErrorType
+from value import Value, BUILDER_THRESHOLD
+
+PROGRAM = lines('''func double n:int int
+  return * n 2
+endfunc
+func main void
+  var int x
+  assign x 3
+  funccall double x
+  funccall print resulti
+endfunc
+''')
+
+
+def hooked(events, *names):
+  interpreter = Interpreter(console_output=False, input=list(INPUT))
+  for name in names:
+    interpreter.add_hook(name, lambda interpreter, *args, name=name: events.append((name,) + args))
+  return interpreter
+
+
+@pytest.mark.parametrize('name', SAMPLES)
+def test_hooks_dont_change_runs(name):
+  interpreter = hooked([], 'statement', 'call', 'return', 'assign', 'output', 'error')
+  assert finish(interpreter, load(name)) == run(load(name))
+
+
+def test_events():
+  events = []
+  interpreter = hooked(events, 'call', 'return', 'assign', 'output')
+  interpreter.run(PROGRAM)
+  assert isinstance(events[1][2], Value)
+  events[1] = ('assign', 'x', events[1][2].value())
+  assert events == [
+    ('call', 'main', {}),
+    ('assign', 'x', 3),
+    ('call', 'double', {'n': 3}),
+    ('return', 'double', 6),
+    ('output', '6'),
+    ('return', 'main', None),
+  ]
+  assert not {'_find_first_instruction', '_endfunc', '_assign', 'output'} & set(vars(interpreter))
+
+
+def test_statement_and_error_events():
+  events = []
+  interpreter = hooked(events, 'statement', 'error')
+  with pytest.raises(Exception):
+    interpreter.run(lines('func main void\n  funccall print "a"\n  funccall print x\nendfunc\n'))
+  assert [event[1] for event in events[:2]] == [1, 2]
+  assert events[2][0] == 'error'
+  assert interpreter.get_error_type_and_line() == (ErrorType.NAME_ERROR, 2)
+
+
+def test_coverage_with_hooks():
+  plain = Interpreter(console_output=False, input=list(INPUT), coverage=True)
+  plain.run(load('fib.src'))
+  interpreter = Interpreter(console_output=False, input=list(INPUT), coverage=True)
+  interpreter.add_hook('call', lambda *args: None)
+  interpreter.run(load('fib.src'))
+  assert interpreter.line_hits == plain.line_hits and any(plain.line_hits)
+  assert interpreter.call_counts == plain.call_counts
+
+
+def test_unknown_event():
+  with pytest.raises(ValueError):
+    Interpreter().add_hook('exit', print)
+
+
+def test_assign_hooks_leave_strings_unbuilt():
+  program = lines('''func main void
+  var string s
+  var int i
+  while < i 1000
+    assign s + s "x"
+    assign i + i 1
+  endwhile
+  funccall print s
+endfunc
+''')
+  seen = []
+  interpreter = Interpreter(console_output=False)
+  interpreter.add_hook('assign', lambda interpreter, name, value: seen.append(type(value.v).__name__))
+  assert finish(interpreter, program) == (['x' * 1000], (None, None))
+  assert seen.count('StringBuilder') == 1000 - BUILDER_THRESHOLD + 1
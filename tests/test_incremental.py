@@ -0,0 +1,67 @@
+import pytest
+from helpers import SAMPLES, load, lines, run, finish
+from interpreterv2 import Interpreter
+from incremental import IncrementalFrontEnd
+import frontend
+
+
+def assert_same_blocks(program, expected):
+  assert list(program.jumps) == list(expected.jumps)
+  assert bytes(program.opens_scope) == bytes(expected.opens_scope)
+  assert bytes(program.closes_scope) == bytes(expected.closes_scope)
+
+
+@pytest.mark.parametrize('name', SAMPLES)
+def test_edits_compile_like_a_full_compile(name):
+  program = load(name)
+  front_end = IncrementalFrontEnd()
+  front_end.update(load(SAMPLES[0]))
+  assert_same_blocks(front_end.update(program), frontend.compile_program(program))
+  for start in range(len(program)):
+    for end in (start + 1, start + 4):
+      edited = program[:start] + program[end:]
+      front_end.update(program)
+      assert_same_blocks(front_end.update(edited), frontend.compile_program(edited))
+
+
+@pytest.mark.parametrize('name', SAMPLES)
+def test_reruns_match_the_interpreter(name):
+  interpreter = Interpreter(console_output=False, input=['7', '3', 'bob', '12'], incremental=True)
+  finish(interpreter, load(SAMPLES[0]))
+  interpreter.reset()
+  assert finish(interpreter, load(name)) == run(load(name))
+
+
+def test_region_that_lost_lines_to_a_deleted_function():
+  # f loses its body and g's func line, so f's region is as long as before but holds g's body
+  old = lines('''func main void
+  funccall f
+endfunc
+func f void
+  while False
+  endwhile
+  var int q
+  var int r
+endfunc
+func g void
+  if False
+    var int z
+    funccall print "C"
+  endif
+endfunc
+''')
+  new = old[:4] + old[10:]
+  interpreter = Interpreter(console_output=False, incremental=True)
+  finish(interpreter, old)
+  interpreter.reset()
+  assert finish(interpreter, new) == ([], (None, None))
+
+
+def test_only_edited_lines_are_tokenized():
+  program = load('fib.src')
+  front_end = IncrementalFrontEnd()
+  front_end.update(program)
+  edited = list(program)
+  edited[1] = '  if <= n 1\n'
+  front_end.update(edited)
+  assert front_end.lines_tokenized == 1
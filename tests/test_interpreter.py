@@ -0,0 +1,138 @@
+import pytest
+from helpers import load, lines, run, finish
+from interpreterv2 import Interpreter
+from intbase import ErrorType
+
+MODES = [{}, {'jit': True}, {'superinstructions': True}, {'incremental': True}]
+
+
+@pytest.mark.parametrize('options', MODES)
+def test_variables_hide_result_registers(options):
+  # declared variables and parameters come before the registers, as they did when the registers
+  # were kept in the outermost scope
+  assert run(load('shadow.src'), **options) == (['9', '7', '2', '4', '7'], (None, None))
+
+
+@pytest.mark.parametrize('options', MODES)
+def test_result_registers(options):
+  program = lines('''func f int
+  return 5
+endfunc
+func main void
+  funccall f
+  funccall print resulti
+  assign resulti + resulti 1
+  funccall print resulti
+endfunc
+''')
+  assert run(program, **options) == (['5', '6'], (None, None))
+
+
+@pytest.mark.parametrize('options', MODES)
+def test_skipped_if_leaves_no_scope_behind(options):
+  # the if's block scope used to stay pushed when its condition was false and it had no else
+  program = lines('''func main void
+  var int x
+  if False
+    funccall print "no"
+  endif
+  var int x
+endfunc
+''')
+  assert run(program, **options) == ([], (ErrorType.NAME_ERROR, 5))
+  program = lines('''func f void
+  var int y
+  assign y 5
+  if False
+    funccall print "no"
+  endif
+endfunc
+func main void
+  funccall f
+  funccall print y
+endfunc
+''')
+  assert run(program, **options) == ([], (ErrorType.NAME_ERROR, 9))
+
+
+@pytest.mark.parametrize('options', MODES)
+def test_return_only_drops_the_callees_scopes(options):
+  # returning used to pop a scope for every endif/endwhile after the return, entered or not
+  program = lines('''func f int
+  if True
+    return 1
+  endif
+  while False
+    funccall print "no"
+  endwhile
+  if False
+    funccall print "no"
+  endif
+  return 2
+endfunc
+func main void
+  var int x
+  assign x 7
+  if True
+    funccall f
+    funccall print resulti " " x
+  endif
+  funccall print x
+endfunc
+''')
+  assert run(program, **options) == (['1 7', '7'], (None, None))
+
+
+@pytest.mark.parametrize('options', MODES)
+def test_by_value_and_by_reference_arguments(options):
+  program = lines('''func bump n:int s:string r:refint void
+  assign n + n 1
+  assign s + s "!"
+  assign r + r 1
+  funccall print n " " s " " r
+endfunc
+func main void
+  var int a b
+  var string t
+  assign a 1
+  assign t "hi"
+  assign b 10
+  while < a 3
+    funccall bump a t b
+    assign a + a 1
+  endwhile
+  funccall print a " " t " " b
+  funccall bump 5 "lit" 7
+  funccall bump a t
+endfunc
+''')
+  expected = ['2 hi! 11', '3 hi! 12', '3 hi 12', '6 lit! 8']
+  assert run(program, **options) == (expected, (ErrorType.NAME_ERROR, 18))
+
+
+@pytest.mark.parametrize('options', MODES)
+def test_call_sites_are_checked_every_time_they_run(options):
+  program = lines('''func show n:int void
+  funccall print "int " n
+endfunc
+func main void
+  var int i
+  while < i 3
+    if == i 2
+      funccall show "two"
+    endif
+    funccall show i
+    assign i + i 1
+  endwhile
+endfunc
+''')
+  assert run(program, **options) == (['int 0', 'int 1'], (ErrorType.TYPE_ERROR, 7))
+
+
+def test_call_sites_are_not_reused_across_programs():
+  interpreter = Interpreter(console_output=False)
+  first = lines('func f void\n  funccall print "f"\nendfunc\nfunc main void\n  funccall f\nendfunc\n')
+  second = lines('func g x:int void\n  funccall print "g"\nendfunc\nfunc main void\n  funccall g\nendfunc\n')
+  assert finish(interpreter, first) == (['f'], (None, None))
+  interpreter.reset()
+  assert finish(interpreter, second) == ([], (ErrorType.NAME_ERROR, 4))
@@ -0,0 +1,54 @@
+import json
+import pytest
+from helpers import SAMPLES, INPUT, load, lines, run, finish
+from interpreterv2 import Interpreter
+from linecov import CoverageReport
+
+PROGRAM = lines('''func used n:int int
+  return n
+endfunc
+func unused void
+  funccall print "never"
+endfunc
+func main void
+  # a comment
+  funccall used 1
+  funccall used 2
+  if False
+    funccall print "no"
+  endif
+endfunc
+''')
+
+
+@pytest.mark.parametrize('name', SAMPLES)
+def test_covered_lines_are_the_lines_run(name):
+  interpreter = Interpreter(console_output=False, input=list(INPUT), coverage=True)
+  assert finish(interpreter, load(name)) == run(load(name))
+  ran, calls = set(), {}
+  counting = Interpreter(console_output=False, input=list(INPUT))
+  counting.add_hook('statement', lambda interpreter, line_num: ran.add(line_num))
+  counting.add_hook('call', lambda interpreter, name, args: calls.__setitem__(name, calls.get(name, 0) + 1))
+  finish(counting, load(name))
+  assert {line_num for line_num, hit in enumerate(interpreter.line_hits) if hit} == ran
+  assert {name: count for name, count in interpreter.call_counts.items() if count} == calls
+
+
+def test_report():
+  interpreter = Interpreter(console_output=False, coverage=True)
+  interpreter.run(PROGRAM)
+  report = CoverageReport.from_interpreter(interpreter, 'program.src')
+  # a return leaves before endfunc, and a false if jumps past its endif
+  assert report.lines == {2: 1, 3: 0, 5: 0, 6: 0, 9: 1, 10: 1, 11: 1, 12: 0, 13: 0, 14: 1}
+  assert report.functions == {'used': (1, 2), 'unused': (4, 0), 'main': (7, 1)}
+  data = json.loads(report.to_json())
+  assert (data['covered'], data['total']) == (5, 10)
+  lcov = report.to_lcov().splitlines()
+  assert 'FNDA:2,used' in lcov and 'DA:12,0' in lcov and 'LH:5' in lcov and lcov[-1] == 'end_of_record'
+
+
+def test_no_coverage_data():
+  interpreter = Interpreter(console_output=False)
+  interpreter.run(PROGRAM)
+  with pytest.raises(ValueError):
+    CoverageReport.from_interpreter(interpreter)
@@ -0,0 +1,62 @@
+import pytest
+from helpers import SAMPLES, INPUT, load, lines, finish
+from interpreterv2 import Interpreter
+from value import Value
+from memprof import MemoryProfiler
+
+PROGRAM = lines('''func twice n:int int
+  return * n 2
+endfunc
+func main void
+  var string s
+  var int i
+  while < i 3
+    assign s + s "ab"
+    funccall twice i
+    assign i + i 1
+  endwhile
+  funccall print s
+endfunc
+''')
+
+
+@pytest.mark.parametrize('name', SAMPLES)
+def test_matches_the_interpreter(name):
+  interpreter = Interpreter(console_output=False, input=list(INPUT))
+  result = finish(interpreter, load(name))
+  profiled = Interpreter(console_output=False, input=list(INPUT))
+  try:
+    MemoryProfiler().run(profiled, load(name))
+  except Exception:
+    pass
+  assert (profiled.get_output(), profiled.get_error_type_and_line()) == result
+
+
+def test_counts_by_line_and_function():
+  profiler = MemoryProfiler(interval=5)
+  profiler.run(Interpreter(console_output=False), PROGRAM)
+  # statements, values, scopes, string bytes
+  assert profiler.sites[7][:4] == [3, 6, 0, 18]  # the "ab" literal and the concatenated string
+  assert profiler.sites[8][:4] == [3, 3, 3, 0]   # the argument's copy, and a frame
+  assert profiler.sites[1][:4] == [3, 9, 0, 0]   # the literal 2, the product and the register's copy
+  assert profiler.functions()['twice'][:2] == [3, 9]
+  assert profiler.statements == 23
+  assert len(profiler.timeline) == 5 and profiler.peak() is not None
+
+
+def test_only_the_profiled_interpreter_is_wrapped():
+  init = Value.__init__
+  interpreter = Interpreter(console_output=False)
+  MemoryProfiler().run(interpreter, PROGRAM)
+  assert Value.__init__ is init
+  assert not {'_get_value', '_eval_expression', '_endfunc'} & set(vars(interpreter))
+  assert not {'add', 'push_scope', 'set_return'} & set(vars(interpreter.env_manager))
+
+
+def test_wrappers_removed_after_an_error():
+  interpreter = Interpreter(console_output=False)
+  profiler = MemoryProfiler()
+  with pytest.raises(Exception):
+    profiler.run(interpreter, lines('func main void\n  funccall print "a"\n  funccall print x\nendfunc\n'))
+  assert '_get_value' not in vars(interpreter)
+  assert profiler.sites[1][0] == 1
@@ -0,0 +1,64 @@
+from concurrent.futures import ProcessPoolExecutor
+import pytest
+from helpers import SAMPLES, INPUT, load, run, finish
+from interpreterv2 import Interpreter
+import frontend
+import parallel_frontend
+import proggen
+
+
+@pytest.fixture(scope='module')
+def executor():
+  with ProcessPoolExecutor(2) as executor:
+    yield executor
+
+
+@pytest.fixture(autouse=True)
+def always_parallel(monkeypatch):
+  monkeypatch.setattr(parallel_frontend, 'MIN_LINES', 0)
+
+
+def summary(compile, *args, **kwargs):
+  '''Everything a compiled Program holds, or the error compiling it raised.'''
+  try:
+    program = compile(*args, **kwargs)
+  except Exception as e:
+    return type(e).__name__, str(e)
+  tokens = program.tokenized_program
+  return ([tokens[line_num] for line_num in range(len(tokens))], list(tokens.ops), list(program.indents),
+          list(program.jumps), bytes(program.opens_scope), bytes(program.closes_scope),
+          {name: (info.start_ip, info.params, info.return_type) for name, info in program.func_manager.func_cache.items()},
+          program.valid_structure)
+
+
+def programs():
+  samples = [load(name) for name in SAMPLES]
+  yield 'all samples', [line for sample in samples for line in sample]
+  yield 'generated', proggen.generate(functions=12, depth=2, recursion=3, string_size=5)
+  broken = list(samples[1]) * 3
+  broken[len(broken) // 2] = '  assign x "unterminated\n'
+  yield 'tokenizer error', broken
+  yield 'unmatched block', samples[2][:-2] + samples[3]
+
+
+@pytest.mark.parametrize('reachable_only', [False, True])
+@pytest.mark.parametrize('name, program', list(programs()))
+def test_matches_the_serial_front_end(executor, name, program, reachable_only):
+  for processes in (1, 3):
+    assert summary(parallel_frontend.compile_program, program, reachable_only, processes, executor) == \
+      summary(frontend.compile_program, program, reachable_only)
+
+
+def test_split_cuts_at_functions():
+  program = proggen.generate(functions=8)
+  starts = parallel_frontend.split(program, 4)
+  assert starts[0] == 0 and len(starts) > 1
+  assert all(program[start].startswith('func ') for start in starts[1:])
+
+
+def test_interpreter_runs_the_compiled_program(executor):
+  program = [line for name in ('fib.src', 'refs.src') for line in load(name)]
+  interpreter = Interpreter(console_output=False, input=list(INPUT))
+  interpreter.compiled = parallel_frontend.compile_program(program, executor=executor)
+  assert interpreter.compiled.lines is program
+  assert finish(interpreter, program) == run(program)
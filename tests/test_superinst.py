@@ -0,0 +1,45 @@
+import pytest
+from helpers import SAMPLES, INPUT, load, run, finish
+from interpreterv2 import Interpreter
+import superinst
+
+
+@pytest.fixture(autouse=True)
+def every_pair_is_hot(monkeypatch):
+  monkeypatch.setattr(superinst, 'MIN_COUNT', 1)
+  monkeypatch.setattr(superinst, 'profiles', {})
+
+
+@pytest.mark.parametrize('name', SAMPLES)
+def test_profiled_and_specialized_runs_match_the_interpreter(name):
+  expected = run(load(name))
+  interpreter = Interpreter(console_output=False, input=list(INPUT), superinstructions=True)
+  assert finish(interpreter, load(name)) == expected  # profiling run
+  interpreter.reset()
+  assert finish(interpreter, load(name)) == expected  # with superinstructions
+
+
+def test_superinstructions_are_built():
+  program = load('fib.src')
+  interpreter = Interpreter(console_output=False, superinstructions=True)
+  interpreter.run(program)
+  profile = superinst.profiles[superinst.program_hash(program)]
+  assert sum(handler is not None for handler in superinst.build(interpreter, profile)) >= 5
+
+
+def test_profile_round_trip():
+  profile = superinst.Profile({(1, 2): 100, (1, 3): 5, (4, 5): 1})
+  assert superinst.Profile.from_json(profile.to_json()).pairs == profile.pairs
+  assert profile.hot_pairs(min_count=2) == {1: 2}
+  assert profile.hot_pairs() == {1: 2, 4: 5}
+
+
+def test_profiles_are_bounded():
+  interpreter = Interpreter(console_output=False, superinstructions=True)
+  programs = [[f'func main void\n', f'  funccall print {n}\n', 'endfunc\n'] for n in range(superinst.PROFILES_SIZE + 10)]
+  for program in programs:
+    interpreter.reset()
+    interpreter.run(program)
+  assert len(superinst.profiles) == superinst.PROFILES_SIZE
+  assert superinst.program_hash(programs[0]) not in superinst.profiles
+  assert superinst.program_hash(programs[-1]) in superinst.profiles
@@ -0,0 +1,36 @@
+import pytest
+from helpers import SAMPLES, load
+from tokenizer import Tokenizer, TokenStore, Keyword, KEYWORDS
+
+
+def store_of(tokenized, shared=None):
+  store = TokenStore(shared)
+  for tokens in tokenized:
+    store.append(tokens)
+  return store
+
+
+@pytest.mark.parametrize('name', SAMPLES)
+def test_store_matches_the_tokenizer(name):
+  tokenized = Tokenizer.tokenize_program(load(name))
+  store = store_of(tokenized)
+  assert len(store) == len(tokenized)
+  for line_num, tokens in enumerate(tokenized):
+    assert store[line_num] == tokens
+    assert store.args(line_num) == tuple(tokens[1:])
+    assert [store.token(line_num, i) for i in range(len(tokens) + 1)] == tokens + [None]
+    assert store.ops[line_num] == (store.ids[tokens[0]] if tokens else Keyword.NONE)
+  assert [store.ids[keyword] for keyword in KEYWORDS] == list(range(len(KEYWORDS)))
+  assert (Keyword.FUNC, Keyword.VAR) == (store.ids['func'], store.ids['var'])
+
+
+def test_merge_and_extend():
+  first = Tokenizer.tokenize_program(load('fib.src'))
+  second = Tokenizer.tokenize_program(load('refs.src'))
+  store = store_of(first)
+  store.merge(store_of(second))  # its own symbol table
+  assert [store[i] for i in range(len(store))] == first + second
+  copy = TokenStore(store)
+  copy.extend(store, 2, len(first) + 3)
+  assert [copy[i] for i in range(len(copy))] == (first + second)[2:len(first) + 3]
+  assert list(copy.ops) == list(store.ops[2:len(first) + 3])
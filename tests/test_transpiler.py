@@ -0,0 +1,69 @@
+import pytest
+from helpers import SAMPLES, load, lines, run
+import transpiler
+from intbase import ErrorType
+
+DEEP = lines('''func down n:int int
+  if == n 0
+    return 0
+  endif
+  var int m
+  assign m - n 1
+  funccall down m
+  return + resulti 1
+endfunc
+func main void
+  funccall input "depth?"
+  funccall strtoint results
+  funccall down resulti
+  funccall print resulti
+  funccall input
+  funccall print results
+endfunc
+''')
+
+
+@pytest.mark.parametrize('name', SAMPLES)
+def test_matches_the_interpreter(name):
+  assert run(load(name), jit=True) == run(load(name))
+
+
+def test_recursion_deeper_than_python_allows_reruns_in_the_interpreter():
+  depth = str(transpiler.RECURSION_LIMIT + 1000)
+  assert transpiler.compile_program(DEEP) is not None
+  assert run(DEEP, [depth, 'done'], jit=True) == (['depth?', depth, 'done'], (None, None))
+
+
+def test_code_cache_is_bounded():
+  for n in range(transpiler.CODE_CACHE_SIZE + 10):
+    transpiler.compile_program(lines(f'func main void\n  funccall print {n}\nendfunc\n'))
+  assert len(transpiler._code_cache) == transpiler.CODE_CACHE_SIZE
+  first = lines('func main void\n  funccall print 0\nendfunc\n')
+  assert tuple(first) not in transpiler._code_cache
+
+
+def test_code_cache_tells_programs_with_the_same_text_apart():
+  program = ['func main void', '  funccall print 1', 'endfunc']
+  joined = ['func main void  funccall print 1', 'endfunc']
+  assert transpiler.compile_program(program) is not None
+  assert transpiler.compile_program(joined) is None
+
+
+@pytest.mark.parametrize('op, left', [('&', 'False'), ('|', 'True')])
+def test_logical_operators_evaluate_both_operands(op, left):
+  program = lines(f'''func main void
+  var bool b
+  assign b {op} {left} resultb
+  funccall print b
+endfunc
+''')
+  assert transpiler.compile_program(program) is not None
+  assert run(program, jit=True) == run(program) == ([], (ErrorType.NAME_ERROR, 2))
+
+
+def test_transpiler_bugs_are_not_hidden(monkeypatch):
+  def transpile(self):
+    raise RuntimeError('bug')
+  monkeypatch.setattr(transpiler.Transpiler, 'transpile', transpile)
+  with pytest.raises(RuntimeError):
+    transpiler.compile_program(lines('func main void\n  funccall print "bug"\nendfunc\n'))
@@ -0,0 +1,36 @@
+from helpers import lines, run
+from value import StringBuilder, BUILDER_THRESHOLD, concat
+
+
+def test_short_strings_stay_strings():
+  assert concat('ab', 'cd') == 'abcd'
+  assert type(concat('ab', 'cd')) is str
+
+
+def test_builders_behave_like_strings():
+  long = 'x' * BUILDER_THRESHOLD
+  a = concat(long, 'a')
+  assert type(a) is StringBuilder
+  b = concat(a, 'b')  # appends in place: a ends the shared list
+  c = concat(a, 'c')  # a no longer does, so this copies
+  assert (str(a), str(b), str(c)) == (long + 'a', long + 'ab', long + 'ac')
+  assert str(concat('<', b)) == '<' + long + 'ab'
+
+
+def test_aliased_strings_in_a_program():
+  program = lines(f'''func main void
+  var string s t
+  var int i
+  while < i {BUILDER_THRESHOLD + 10}
+    assign s + s "x"
+    assign i + i 1
+  endwhile
+  assign t s
+  assign s + s "s"
+  assign t + t "t"
+  funccall print s
+  funccall print t
+endfunc
+''')
+  x = 'x' * (BUILDER_THRESHOLD + 10)
+  assert run(program) == ([x + 's', x + 't'], (None, None))
@@ -1,3 +1,5 @@
+import sys
+from array import array
 from intbase import InterpreterBase, ErrorType
 
 # Tokenzies a program, e.g., "assign var + 5 10" --> ["assign","var","+","5","10"] for each line of the input program
@@ -22,6 +24,8 @@ class Tokenizer:
    return s
 
   def _tokenize(line_num, s):
+    if '"' not in s:
+      return s.split(InterpreterBase.COMMENT_DEF, 1)[0].split()  # no strings, so the first # starts the comment
     s = Tokenizer._remove_comment(s)
 
     tokens = []
@@ -43,3 +47,85 @@ class Tokenizer:
     # no more quotes found, tokenize remaining string
     tokens += s[search_from:].split()
     return tokens
+
+
+class Keyword:
+  '''
+  Integer ids of the statement keywords. They're interned first in every TokenStore, so they're
+  the same small ids everywhere and statements can be dispatched with integer compares.
+  '''
+  NONE = -1  # blank line
+  FUNC, ENDFUNC, WHILE, ELSE, ENDWHILE, ENDIF, ASSIGN, FUNCCALL, IF, RETURN, VAR = range(11)
+
+KEYWORDS = (InterpreterBase.FUNC_DEF, InterpreterBase.ENDFUNC_DEF, InterpreterBase.WHILE_DEF,
+            InterpreterBase.ELSE_DEF, InterpreterBase.ENDWHILE_DEF, InterpreterBase.ENDIF_DEF,
+            InterpreterBase.ASSIGN_DEF, InterpreterBase.FUNCCALL_DEF, InterpreterBase.IF_DEF,
+            InterpreterBase.RETURN_DEF, InterpreterBase.VAR_DEF)
+
+# A tokenized program stored compactly: every distinct token is interned once in a symbol table and
+# the program is a flat array of symbol ids, with the offset of each line's first token in another
+# array, instead of a list of lists of separate strings.
+# Indexing a TokenStore still gives a line's tokens as a list of strings, e.g. store[3] --> ["assign","x","10"]
+class TokenStore:
+  def __init__(self, shared=None):
+    if shared is None:
+      self.symbols = list(KEYWORDS)  # symbol id -> token
+      self.ids = {symbol: i for i, symbol in enumerate(KEYWORDS)}  # token -> symbol id
+    else:
+      # share (and keep growing) another store's symbol table, so ids can be copied between them
+      self.symbols = shared.symbols
+      self.ids = shared.ids
+    self.data = array('I')          # symbol ids of every token of every line
+    self.offsets = array('I', [0])  # line i's tokens are data[offsets[i]:offsets[i+1]]
+    self.ops = array('i')           # symbol id of each line's first token, or Keyword.NONE
+
+  def __len__(self):
+    return len(self.ops)
+
+  def __getitem__(self, line_num):
+    return list(map(self.symbols.__getitem__, self.data[self.offsets[line_num]:self.offsets[line_num + 1]]))
+
+  def args(self, line_num):
+    '''Returns the tokens after the first one on a line, as a tuple.'''
+    return tuple(map(self.symbols.__getitem__, self.data[self.offsets[line_num] + 1:self.offsets[line_num + 1]]))
+
+  def token(self, line_num, index):
+    '''Returns a single token of a line, or None if the line is shorter.'''
+    offset = self.offsets[line_num] + index
+    return self.symbols[self.data[offset]] if offset < self.offsets[line_num + 1] else None
+
+  def append(self, tokens):
+    '''Adds the next line of the program.'''
+    ids, data = self.ids, self.data
+    for token in tokens:
+      symbol_id = ids.get(token)
+      if symbol_id is None:
+        symbol_id = ids[token] = len(self.symbols)
+        self.symbols.append(sys.intern(token))
+      data.append(symbol_id)
+    self.offsets.append(len(data))
+    self.ops.append(ids[tokens[0]] if tokens else Keyword.NONE)
+
+  def merge(self, other):
+    '''Adds every line of another store that has its own symbol table, translating its symbol ids.'''
+    ids, symbols = self.ids, self.symbols
+    translate = []  # other's symbol id -> this store's
+    for token in other.symbols:
+      symbol_id = ids.get(token)
+      if symbol_id is None:
+        symbol_id = ids[token] = len(symbols)
+        symbols.append(sys.intern(token))
+      translate.append(symbol_id)
+    shift = len(self.data) - other.offsets[0]
+    self.data.extend(array('I', map(translate.__getitem__, other.data)))
+    self.offsets.extend(array('I', [offset + shift for offset in other.offsets[1:]]))
+    translate.append(Keyword.NONE)  # so translate[Keyword.NONE], the last item, keeps blank lines blank
+    self.ops.extend(array('i', map(translate.__getitem__, other.ops)))
+
+  def extend(self, other, start, end):
+    '''Adds lines [start, end) of another store sharing this store's symbol table.'''
+    first, last = other.offsets[start], other.offsets[end]
+    shift = len(self.data) - first
+    self.data.extend(other.data[first:last])
+    self.offsets.extend(array('I', [offset + shift for offset in other.offsets[start + 1:end + 1]]))
+    self.ops.extend(other.ops[start:end])
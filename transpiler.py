@@ -0,0 +1,558 @@
+import builtins
+import sys
+import threading
+from intbase import InterpreterBase, ErrorType
+from value import Type
+import frontend
+from tokenizer import Keyword
+
+# Transpiles a Brewin program into Python source, one Python function per Brewin function, and
+# compiles it into a code object that runs at CPython speed.
+#
+# Since every variable is declared with a type, the type of every expression is known before the
+# program runs, so the generated code works directly on Python ints, bools and strs:
+# - locals (and shadowed locals) become uniquely named Python locals
+# - refint/refbool/refstring parameters, and the caller's variables passed to them, become cells
+#   (one element lists) so the callee can write through them
+# - resulti/resultb/results become globals of the generated module
+# - calls to small functions that don't call other functions are inlined
+#
+# Anything the transpiler can't prove behaves exactly like the interpreter (type errors, names that
+# would only resolve through a caller's scope, malformed blocks, ...) raises Unsupported, and the
+# caller falls back to the interpreter for the whole program.
+
+FILENAME = '<brewin>'
+RECURSION_LIMIT = 100000  # generated functions recurse on the Python stack
+INLINE_LIMIT = 8  # statements in a function small enough to inline at its call sites
+BUILTINS = {InterpreterBase.PRINT_DEF, InterpreterBase.INPUT_DEF, InterpreterBase.STRTOINT_DEF}
+
+RESULT_TYPES = {
+  InterpreterBase.RESULT_DEF + 'i': Type.INT,
+  InterpreterBase.RESULT_DEF + 'b': Type.BOOL,
+  InterpreterBase.RESULT_DEF + 's': Type.STRING,
+}
+RESULT_NAMES = {result_type: name for name, result_type in RESULT_TYPES.items()}
+
+DEFAULTS = {Type.INT: '0', Type.BOOL: 'False', Type.STRING: "''"}
+
+VAR_TYPES = {
+  InterpreterBase.INT_DEF: Type.INT,
+  InterpreterBase.BOOL_DEF: Type.BOOL,
+  InterpreterBase.STRING_DEF: Type.STRING,
+}
+
+# Python operator (and result type) for every valid Brewin operator on every type
+OPERATORS = {
+  Type.INT: {
+    '+': ('+', Type.INT), '-': ('-', Type.INT), '*': ('*', Type.INT),
+    '/': ('//', Type.INT), '%': ('%', Type.INT),
+    '==': ('==', Type.BOOL), '!=': ('!=', Type.BOOL), '<': ('<', Type.BOOL),
+    '<=': ('<=', Type.BOOL), '>': ('>', Type.BOOL), '>=': ('>=', Type.BOOL),
+  },
+  Type.STRING: {
+    '+': ('+', Type.STRING),
+    '==': ('==', Type.BOOL), '!=': ('!=', Type.BOOL), '<': ('<', Type.BOOL),
+    '<=': ('<=', Type.BOOL), '>': ('>', Type.BOOL), '>=': ('>=', Type.BOOL),
+  },
+  Type.BOOL: {
+    # & and | on bools evaluate both operands, as Brewin does, where and/or would stop early
+    '&': ('&', Type.BOOL), '|': ('|', Type.BOOL),
+    '==': ('==', Type.BOOL), '!=': ('!=', Type.BOOL),
+  },
+}
+BINARY_OPS = {op for ops in OPERATORS.values() for op in ops}
+
+# runs in progress, and the recursion limit to restore when the last one finishes
+_recursion = {'runs': 0, 'limit': None}
+_recursion_lock = threading.Lock()
+
+CODE_CACHE_SIZE = 64  # programs whose CompiledProgram is kept, evicting the least recently used
+_code_cache = {}  # tuple of the program's lines -> CompiledProgram, or None if the program can't be transpiled
+_code_cache_lock = threading.Lock()
+
+
+class Unsupported(Exception):
+  '''
+  Raised when a program uses something the transpiler doesn't handle.
+  '''
+
+
+class CompiledProgram:
+  '''
+  A transpiled program: the code object defining one Python function per Brewin function, the name
+  of the function for main, and a map from generated line numbers back to Brewin line numbers.
+  '''
+  def __init__(self, source, code, entry, line_map):
+    self.source = source
+    self.code = code
+    self.entry = entry
+    self.line_map = line_map
+
+
+class Decl:
+  '''
+  A declared Brewin variable (or parameter) and the Python local that holds it.
+  '''
+  def __init__(self, pyname, var_type, celled):
+    self.pyname = pyname
+    self.type = var_type
+    self.celled = celled
+
+  def load(self):
+    return f'{self.pyname}[0]' if self.celled else self.pyname
+
+
+class Transpiler:
+  '''
+  Generates Python source for every function reachable from main.
+  '''
+  def __init__(self, tokenized_program, indents, func_manager):
+    self.tokenized_program = tokenized_program
+    self.indents = indents
+    self.func_manager = func_manager
+    self.func_names = {}  # brewin function name -> python function name
+    self.celled = set()   # (line_num, name) of every declaration that must live in a cell
+    self.inlinable = {}   # brewin function name -> whether calls to it are inlined
+    self.inlining = False # whether the body being generated is inlined into a caller
+
+  def transpile(self):
+    '''
+    Returns (source, entry function name, line map); raises Unsupported.
+    '''
+    main_info = self.func_manager.get_function_info(InterpreterBase.MAIN_FUNC)
+    if main_info is None or main_info.names:
+      raise Unsupported('main')
+    # The first pass discovers which declarations are passed by reference (and so need cells); the
+    # second pass generates the final code knowing that.
+    self._transpile_all()
+    return self._transpile_all()
+
+  def _transpile_all(self):
+    self.func_names = {}
+    self.lines = []
+    self.line_map = {}
+    self.pending = []  # functions that are called but not yet transpiled
+    self._python_name(InterpreterBase.MAIN_FUNC)
+    while self.pending:
+      self._transpile_function(self.pending.pop())
+    source = '\n'.join(self.lines) + '\n'
+    return source, self.func_names[InterpreterBase.MAIN_FUNC], self.line_map
+
+  def _python_name(self, func_name):
+    if func_name not in self.func_names:
+      self.func_names[func_name] = f'f{len(self.func_names)}'
+      self.pending.append(func_name)
+    return self.func_names[func_name]
+
+  def _emit(self, depth, text, line_num):
+    self.lines.append('  ' * depth + text)
+    self.line_map[len(self.lines)] = line_num
+
+  def _transpile_function(self, func_name):
+    func_info = self.func_manager.get_function_info(func_name)
+    header = func_info.start_ip - 1
+    self.return_type = func_info.return_type
+    self.returned = False
+    self.next_local = 0
+
+    params = {}
+    for name, value in zip(func_info.names, func_info.values):
+      if name in params or name in RESULT_TYPES:
+        raise Unsupported(name)
+      params[name] = self._declare(header, name, value.type(), value.ref)
+    self.scopes = [params]
+    # By-value parameters that are passed on by reference arrive as plain values and are boxed
+    # into their cell on entry
+    boxed = [(decl, f'a{i}') for i, (decl, value) in enumerate(zip(params.values(), func_info.values))
+             if decl.celled and not value.ref]
+    args = ', '.join(dict(boxed).get(decl, decl.pyname) for decl in params.values())
+    self._emit(0, f'def {self.func_names[func_name]}({args}):  # {func_name}', header)
+    self._emit(1, 'global ' + ', '.join(RESULT_TYPES), header)
+    for decl, arg in boxed:
+      self._emit(1, f'{decl.pyname} = [{arg}]', header)
+
+    self._body(func_info.start_ip, 1)
+
+  def _body(self, line_num, base):
+    '''
+    Generates the statements of a function body, starting at line_num, base levels deep.
+    '''
+    blocks = []  # [keyword, indent, line, statements emitted]
+    while True:
+      if line_num >= len(self.tokenized_program):
+        raise Unsupported('missing endfunc')
+      tokens = self.tokenized_program[line_num]
+      if tokens:
+        if blocks:
+          blocks[-1][3] += 1
+        depth = len(blocks) + base
+        keyword, args = tokens[0], tokens[1:]
+        if keyword == InterpreterBase.ENDFUNC_DEF:
+          if blocks:
+            raise Unsupported('unterminated block')
+          if not self.returned:
+            self._default_return(depth, line_num)
+          break
+        elif keyword == InterpreterBase.IF_DEF or keyword == InterpreterBase.WHILE_DEF:
+          self._emit(depth, f'{keyword} {self._condition(args, line_num)}:', line_num)
+          blocks.append([keyword, self.indents[line_num], line_num, 0])
+          self.scopes.append({})
+        elif keyword == InterpreterBase.ELSE_DEF:
+          self._close_block(InterpreterBase.IF_DEF, blocks, line_num, base)
+          self._emit(depth - 1, 'else:', line_num)
+          blocks.append([InterpreterBase.ELSE_DEF, self.indents[line_num], line_num, 0])
+          self.scopes.append({})
+        elif keyword == InterpreterBase.ENDIF_DEF:
+          if not blocks or blocks[-1][0] != InterpreterBase.ELSE_DEF:
+            self._close_block(InterpreterBase.IF_DEF, blocks, line_num, base)
+          else:
+            self._close_block(InterpreterBase.ELSE_DEF, blocks, line_num, base)
+        elif keyword == InterpreterBase.ENDWHILE_DEF:
+          self._close_block(InterpreterBase.WHILE_DEF, blocks, line_num, base)
+        else:
+          self._statement(depth, keyword, args, line_num)
+      line_num += 1
+
+  def _close_block(self, keyword, blocks, line_num, base):
+    if not blocks or blocks[-1][0] != keyword or blocks[-1][1] != self.indents[line_num]:
+      raise Unsupported('mismatched block')
+    if blocks[-1][3] == 1:  # nothing but the closing line itself
+      self._emit(len(blocks) + base, 'pass', line_num)
+    blocks.pop()
+    self.scopes.pop()
+
+  def _declare(self, line_num, name, var_type, celled=False):
+    pyname = f'v{self.next_local}'
+    self.next_local += 1
+    celled = celled or (line_num, name) in self.celled
+    decl = Decl(pyname, var_type, celled)
+    decl.key = (line_num, name)
+    return decl
+
+  def _lookup(self, name):
+    for scope in reversed(self.scopes):
+      if name in scope:
+        return scope[name]
+    # Anything else would only resolve through a caller's scope at runtime
+    raise Unsupported(name)
+
+  def _statement(self, depth, keyword, args, line_num):
+    if keyword == InterpreterBase.VAR_DEF:
+      if len(args) < 2 or args[0] not in VAR_TYPES:
+        raise Unsupported('var')
+      var_type = VAR_TYPES[args[0]]
+      for name in args[1:]:
+        if name in self.scopes[-1] or name in RESULT_TYPES:
+          raise Unsupported(name)
+        decl = self._declare(line_num, name, var_type)
+        self.scopes[-1][name] = decl
+        default = DEFAULTS[var_type]
+        self._emit(depth, f'{decl.pyname} = [{default}]' if decl.celled else f'{decl.pyname} = {default}', line_num)
+    elif keyword == InterpreterBase.ASSIGN_DEF:
+      if len(args) < 2:
+        raise Unsupported('assign')
+      decl = self._lookup(args[0])
+      expr, expr_type = self._expression(args[1:])
+      if expr_type != decl.type:
+        raise Unsupported('type')
+      self._emit(depth, f'{decl.load()} = {expr}', line_num)
+    elif keyword == InterpreterBase.FUNCCALL_DEF:
+      self._funccall(depth, args, line_num)
+    elif keyword == InterpreterBase.RETURN_DEF:
+      if not args:
+        self._default_return(depth, line_num)
+        return
+      expr, expr_type = self._expression(args)
+      if expr_type != self.return_type:
+        raise Unsupported('return type')
+      self._emit(depth, f'{RESULT_NAMES[expr_type]} = {expr}', line_num)
+      self._return(depth, line_num)
+    else:
+      raise Unsupported(keyword)
+
+  def _default_return(self, depth, line_num):
+    if self.return_type in RESULT_NAMES:
+      self._emit(depth, f'{RESULT_NAMES[self.return_type]} = {DEFAULTS[self.return_type]}', line_num)
+    self._return(depth, line_num)
+
+  def _return(self, depth, line_num):
+    if self.inlining:
+      self.returned = True  # an inlined function can only return from its last statement
+    else:
+      self._emit(depth, 'return', line_num)
+
+  def _funccall(self, depth, args, line_num):
+    if not args:
+      raise Unsupported('funccall')
+    func_name, args = args[0], args[1:]
+    if func_name == InterpreterBase.PRINT_DEF:
+      if not args:
+        raise Unsupported('print')
+      self._emit(depth, f'_output({self._format(args)})', line_num)
+    elif func_name == InterpreterBase.INPUT_DEF:
+      if args:
+        self._emit(depth, f'_output({self._format(args)})', line_num)
+      self._emit(depth, f'{RESULT_NAMES[Type.STRING]} = _input()', line_num)
+    elif func_name == InterpreterBase.STRTOINT_DEF:
+      if len(args) != 1:
+        raise Unsupported('strtoint')
+      expr, expr_type = self._operand(args[0])
+      if expr_type != Type.STRING:
+        raise Unsupported('strtoint')
+      self._emit(depth, f'{RESULT_NAMES[Type.INT]} = int({expr})', line_num)
+    else:
+      func_info = self.func_manager.get_function_info(func_name)
+      if func_info is None or len(func_info.names) != len(args):
+        raise Unsupported(func_name)
+      if self._inlinable(func_name, func_info):
+        self._inline(depth, func_info, args, line_num)
+        return
+      call_args = []
+      for arg, param in zip(args, func_info.values):
+        expr, expr_type = self._operand(arg)
+        if expr_type != param.type():
+          raise Unsupported('argument type')
+        if param.ref:
+          expr = self._cell(arg, expr)
+        call_args.append(expr)
+      self._emit(depth, f'{self._python_name(func_name)}({", ".join(call_args)})', line_num)
+
+  def _inlinable(self, func_name, func_info):
+    '''
+    Whether a function is inlined: it has at most INLINE_LIMIT statements, calls no other
+    functions (so it can't recurse), and only returns from its last statement.
+    '''
+    inlinable = self.inlinable.get(func_name)
+    if inlinable is None:
+      inlinable = self.inlinable[func_name] = self._small_leaf(func_info)
+    return inlinable
+
+  def _small_leaf(self, func_info):
+    statements = 0
+    nesting = 0
+    last = None
+    line_num = func_info.start_ip
+    while line_num < len(self.tokenized_program):
+      tokens = self.tokenized_program[line_num]
+      line_num += 1
+      if not tokens:
+        continue
+      keyword = tokens[0]
+      if keyword == InterpreterBase.ENDFUNC_DEF:
+        return statements <= INLINE_LIMIT
+      if last == InterpreterBase.RETURN_DEF:
+        return False  # a return before the end
+      statements += 1
+      if keyword == InterpreterBase.FUNCCALL_DEF and (len(tokens) < 2 or tokens[1] not in BUILTINS):
+        return False
+      if keyword == InterpreterBase.IF_DEF or keyword == InterpreterBase.WHILE_DEF:
+        nesting += 1
+      elif keyword == InterpreterBase.ENDIF_DEF or keyword == InterpreterBase.ENDWHILE_DEF:
+        nesting -= 1
+      elif keyword == InterpreterBase.RETURN_DEF and nesting:
+        return False
+      last = keyword
+    return False
+
+  def _inline(self, depth, func_info, args, line_num):
+    '''
+    Generates a function's body in place of a call to it. By-value parameters become new locals,
+    and by-reference parameters are the caller's variables themselves.
+    '''
+    header = func_info.start_ip - 1
+    params = {}
+    for arg, name, value in zip(args, func_info.names, func_info.values):
+      if name in params or name in RESULT_TYPES:
+        raise Unsupported(name)
+      expr, expr_type = self._operand(arg)
+      if expr_type != value.type():
+        raise Unsupported('argument type')
+      if value.ref and arg in RESULT_TYPES:
+        raise Unsupported(arg)
+      if value.ref and self._literal(arg) is None:
+        params[name] = self._lookup(arg)
+        continue
+      decl = self._declare(header, name, value.type())
+      self._emit(depth, f'{decl.pyname} = [{expr}]' if decl.celled else f'{decl.pyname} = {expr}', line_num)
+      params[name] = decl
+
+    saved = self.scopes, self.return_type, self.returned, self.inlining
+    self.scopes, self.return_type, self.returned, self.inlining = [params], func_info.return_type, False, True
+    emitted = len(self.lines)
+    self._body(func_info.start_ip, depth)
+    if len(self.lines) == emitted:
+      self._emit(depth, 'pass', line_num)
+    self.scopes, self.return_type, self.returned, self.inlining = saved
+
+  def _cell(self, arg, expr):
+    '''
+    Returns the cell to pass for a by-reference argument.
+    '''
+    if arg in RESULT_TYPES:
+      raise Unsupported(arg)
+    if self._literal(arg) is not None:
+      return f'[{expr}]'  # writes through the reference are simply lost, as in the interpreter
+    decl = self._lookup(arg)
+    self.celled.add(decl.key)
+    return decl.pyname if decl.celled else f'[{expr}]'
+
+  def _format(self, args):
+    '''
+    Returns an f-string that prints every argument back to back.
+    '''
+    template = []
+    for arg in args:
+      literal = self._literal(arg)
+      if literal is not None:
+        template.append(str(literal[0]).replace('{', '{{').replace('}', '}}'))
+      else:
+        template.append('{' + self._operand(arg)[0] + '}')
+    return 'f' + repr(''.join(template))
+
+  def _literal(self, token):
+    '''
+    Returns (value, type) if the token is a constant, mirroring Interpreter._get_value.
+    '''
+    if token[0] == '"':
+      return token.strip('"'), Type.STRING
+    if token.isdigit() or token[0] == '-':
+      try:
+        return int(token), Type.INT
+      except ValueError:
+        raise Unsupported(token)
+    if token == InterpreterBase.TRUE_DEF or token == InterpreterBase.FALSE_DEF:
+      return token == InterpreterBase.TRUE_DEF, Type.BOOL
+    return None
+
+  def _operand(self, token):
+    literal = self._literal(token)
+    if literal is not None:
+      return repr(literal[0]), literal[1]
+    if token in RESULT_TYPES:
+      # An unset result raises NameError, which execute() reports like the interpreter would
+      return token, RESULT_TYPES[token]
+    decl = self._lookup(token)
+    return decl.load(), decl.type
+
+  def _condition(self, tokens, line_num):
+    if not tokens:
+      raise Unsupported('condition')
+    expr, expr_type = self._expression(tokens)
+    if expr_type != Type.BOOL:
+      raise Unsupported('condition type')
+    return expr
+
+  def _expression(self, tokens):
+    '''
+    Translates a prefix expression into a fully parenthesized Python expression.
+    '''
+    stack = []
+    for token in reversed(tokens):
+      if token in BINARY_OPS:
+        if len(stack) < 2:
+          raise Unsupported('expression')
+        (e1, t1), (e2, t2) = stack.pop(), stack.pop()
+        if t1 != t2 or token not in OPERATORS[t1]:
+          raise Unsupported('operand types')
+        op, result_type = OPERATORS[t1][token]
+        stack.append((f'({e1} {op} {e2})', result_type))
+      elif token == '!':
+        if not stack or stack[-1][1] != Type.BOOL:
+          raise Unsupported('!')
+        stack.append((f'(not {stack.pop()[0]})', Type.BOOL))
+      else:
+        stack.append(self._operand(token))
+    if len(stack) != 1:
+      raise Unsupported('expression')
+    return stack[0]
+
+
+def compile_program(program):
+  '''
+  Returns the CompiledProgram for a program (a list of source lines), transpiling and caching it on
+  first use, or None if the program can't be transpiled.
+  '''
+  key = tuple(program)
+  with _code_cache_lock:
+    if key in _code_cache:
+      compiled = _code_cache[key] = _code_cache.pop(key)
+      return compiled
+  try:
+    front = frontend.compile_program(program, reachable_only=True)
+  except Exception:
+    return None  # malformed program: the interpreter's own front end reports the error
+  compiled = None
+  try:
+    ops = front.tokenized_program.ops
+    for line_num, op in enumerate(ops):
+      # blocks the front end couldn't match are found by the interpreter's textual search instead
+      if (op == Keyword.IF or op == Keyword.ELSE or op == Keyword.WHILE or op == Keyword.ENDWHILE) and not front.jumps[line_num]:
+        raise Unsupported('unmatched block')
+    source, entry, line_map = Transpiler(front.tokenized_program, front.indents, front.func_manager).transpile()
+    compiled = CompiledProgram(source, compile(source, FILENAME, 'exec'), entry, line_map)
+  except Unsupported:
+    pass
+  with _code_cache_lock:
+    _code_cache[key] = compiled
+    while len(_code_cache) > CODE_CACHE_SIZE:
+      del _code_cache[next(iter(_code_cache))]
+  return compiled
+
+
+def execute(interpreter, compiled, read=None):
+  '''
+  Runs a CompiledProgram, doing I/O through the interpreter. Every line of input read is appended
+  to read, if given.
+
+  Brewin calls recurse on the Python stack, up to RECURSION_LIMIT calls deep: deeper programs
+  raise RecursionError, for the caller to run in the interpreter instead.
+  '''
+  get_input = interpreter.get_input
+  if read is not None:
+    def get_input(get_input=get_input):
+      line = get_input()
+      read.append(line)
+      return line
+  namespace = {
+    '__builtins__': builtins,
+    '_output': interpreter.output,
+    '_input': get_input,
+  }
+  exec(compiled.code, namespace)
+  # the limit is process-wide, so with runs on several threads only the last one out restores it
+  with _recursion_lock:
+    if _recursion['runs'] == 0:
+      _recursion['limit'] = sys.getrecursionlimit()
+      sys.setrecursionlimit(max(_recursion['limit'], RECURSION_LIMIT))
+    _recursion['runs'] += 1
+  try:
+    namespace[compiled.entry]()
+  except NameError as e:
+    if e.name not in RESULT_TYPES:
+      raise
+    interpreter.error(ErrorType.NAME_ERROR, f'Unknown variable {e.name}', brewin_line(compiled, e))
+  except RecursionError:
+    raise  # not worth walking a traceback this deep for
+  except Exception as e:
+    line_num = brewin_line(compiled, e)
+    if line_num is not None:
+      e.add_note(f'Raised on line {line_num} of the Brewin program')
+    raise
+  finally:
+    with _recursion_lock:
+      _recursion['runs'] -= 1
+      if _recursion['runs'] == 0:
+        sys.setrecursionlimit(_recursion['limit'])
+
+
+def brewin_line(compiled, exception):
+  '''
+  Maps the innermost generated frame of an exception's traceback back to a Brewin line number.
+  '''
+  line_num = None
+  tb = exception.__traceback__
+  while tb is not None:
+    if tb.tb_frame.f_code.co_filename == FILENAME:
+      line_num = compiled.line_map.get(tb.tb_lineno)
+    tb = tb.tb_next
+  return line_num
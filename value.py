@@ -13,9 +13,58 @@ class Type(Enum):
     REFSTRING = 6
     VOID = 7
 
+class StringBuilder:
+    '''
+    A string under construction by repeated concatenation, so that loops like
+    `assign s + s "x"` take linear rather than quadratic time.
+
+    Pieces are appended to a list that can be shared between builders: a builder owns the first
+    `count` pieces, and appending in place is only allowed to the builder that ends the list.
+    Appending to any other builder copies its pieces first, so builders behave like immutable
+    strings even when several variables hold them.
+    '''
+    __slots__ = ('parts', 'count')
+
+    def __init__(self, parts):
+        self.parts = parts
+        self.count = len(parts)
+
+    def concat(self, text):
+        parts = self.parts
+        if len(parts) != self.count:
+            parts = parts[:self.count]
+        parts.append(text)
+        return StringBuilder(parts)
+
+    def __str__(self):
+        text = ''.join(self.parts[:self.count])
+        self.parts = [text]  # later appends to this builder start from the joined string
+        self.count = 1
+        return text
+
+
+# Concatenations shorter than this just build a new string
+BUILDER_THRESHOLD = 256
+
+
+def concat(a, b):
+    '''
+    Concatenates two string values (str or StringBuilder), switching to a StringBuilder once
+    the result gets long.
+    '''
+    if type(b) is StringBuilder:
+        b = str(b)
+    if type(a) is StringBuilder:
+        return a.concat(b)
+    if len(a) + len(b) < BUILDER_THRESHOLD:
+        return a + b
+    return StringBuilder([a, b])
+
+
 class Value:
     '''
-    Represents a value, which has a type and its value.
+    Represents a value, which has a type and its value. String values may be held as a
+    StringBuilder, which is turned back into a str the first time the value is read.
     '''
     def __init__(self, type: Type, value=None, ref=False):
         self.t = type
@@ -23,6 +72,8 @@ class Value:
         self.ref = ref
 
     def value(self):
+        if type(self.v) is StringBuilder:
+            self.v = str(self.v)
         return self.v
 
     def set(self, other):